@@ -0,0 +1,222 @@
+#! -*- coding: utf-8 -*-
+
+import math
+import numbers
+from collections import namedtuple
+
+try:
+    import numpy as np
+except ImportError:  # 没有NumPy时用内置函数逐批计算
+    np = None
+
+# 分组流式聚合：python_coroutine4.py 里 grouper -> averager 的批量版本。
+# 1、send一批数据（list / array.array / NumPy数组）而不是一个值，一次协程恢复处理整批
+# 2、每批用向量化运算（NumPy，或fsum/dist/min/max等C实现的内置函数）求出该批的count/mean/M2/min/max，
+#    再用Chan等人的并行合并公式并入累计结果，得到count、mean、方差、min、max
+# 3、合并公式同样用于跨进程合并：各进程分别聚合，Stats/GroupedAggregator可以pickle后merge
+
+
+Result = namedtuple('Result', 'count mean variance min max')
+
+
+class Stats(object):
+    """
+    count/mean/m2(离差平方和)/min/max，可增量更新、可合并
+    """
+
+    __slots__ = ('count', 'mean', 'm2', 'min', 'max')
+
+    def __init__(self, count=0, mean=0.0, m2=0.0, min=math.inf, max=-math.inf):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+        self.min = min
+        self.max = max
+
+    def __getstate__(self):
+        return (self.count, self.mean, self.m2, self.min, self.max)
+
+    def __setstate__(self, state):
+        self.count, self.mean, self.m2, self.min, self.max = state
+
+    @classmethod
+    def from_batch(cls, values):
+        if np is not None and not isinstance(values, list):
+            # NumPy标量会得到0维数组，统一成一维
+            arr = np.atleast_1d(np.asarray(values, dtype=float)).ravel()
+            n = arr.size
+            if n == 0:
+                return cls()
+            mean = float(arr.mean())
+            dev = arr - mean
+            return cls(n, mean, float(dev.dot(dev)), float(arr.min()), float(arr.max()))
+        n = len(values)
+        if n == 0:
+            return cls()
+        mean = math.fsum(values) / n
+        # math.dist 在C中逐项计算 sqrt(sum((x - mean) ** 2))，精度高且没有逐元素的Python字节码
+        m2 = math.dist(values, [mean] * n) ** 2
+        return cls(n, mean, m2, min(values), max(values))
+
+    def merge(self, other):
+        """
+        把other并入self（Chan et al. 并行方差合并）
+        """
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            self.count, self.mean, self.m2 = other.count, other.mean, other.m2
+            self.min, self.max = other.min, other.max
+            return self
+        n = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / n
+        self.m2 += other.m2 + delta * delta * self.count * other.count / n
+        self.count = n
+        if other.min < self.min:
+            self.min = other.min
+        if other.max > self.max:
+            self.max = other.max
+        return self
+
+    def update(self, values):
+        return self.merge(Stats.from_batch(_as_batch(values)))
+
+    @property
+    def variance(self):
+        # 总体方差；count为0时为None
+        return self.m2 / self.count if self.count else None
+
+    def result(self):
+        if not self.count:
+            return Result(0, None, None, None, None)
+        return Result(self.count, self.mean, self.variance, self.min, self.max)
+
+
+def _as_batch(value):
+    # 兼容逐个send标量的旧用法（含NumPy标量，它们都注册为numbers.Number）
+    if isinstance(value, numbers.Number):
+        return [value]
+    return value
+
+
+# 可以交给np.unique分组的key数组：一维的布尔/整数/浮点/字符串
+_NUMPY_KEY_KINDS = 'biufUS'
+
+
+def _numpy_keys(keys):
+    return isinstance(keys, np.ndarray) and keys.ndim == 1 and keys.dtype.kind in _NUMPY_KEY_KINDS
+
+
+# 子生成器：与python_coroutine4.averager用法相同，但每次send的是一批数据
+def averager():
+    stats = Stats()
+    while True:
+        batch = yield
+        if batch is None:  # 终止条件
+            break
+        stats.update(_as_batch(batch))
+    return stats.result()
+
+
+# 委派生成器
+def grouper(results, key):
+    while True:
+        results[key] = yield from averager()
+
+
+class GroupedAggregator(object):
+    """
+    多个key同时聚合：
+    update(key, values)           一个key的一批数据
+    update_pairs(keys, values)    一批(key, value)对，keys与values等长
+    merge(other)                  并入另一个（例如其他进程的）聚合结果
+    """
+
+    def __init__(self):
+        self._stats = {}
+
+    def __getstate__(self):
+        return self._stats
+
+    def __setstate__(self, state):
+        self._stats = state
+
+    def _get(self, key):
+        stats = self._stats.get(key)
+        if stats is None:
+            stats = self._stats[key] = Stats()
+        return stats
+
+    def update(self, key, values):
+        self._get(key).update(values)
+
+    def update_pairs(self, keys, values):
+        # keys本身是数值/字符串的一维ndarray时才走NumPy分组；
+        # 否则np.asarray会把混合类型的key转成字符串，元组key则无法转换
+        if np is not None and _numpy_keys(keys):
+            self._update_pairs_numpy(keys, values)
+            return
+        groups = {}
+        for k, v in zip(keys, values):
+            group = groups.get(k)
+            if group is None:
+                groups[k] = [v]
+            else:
+                group.append(v)
+        for k, group in groups.items():
+            self._get(k).update(group)
+
+    def _update_pairs_numpy(self, keys, values):
+        # 一次性按key分组求各组count/sum/M2/min/max
+        values = np.asarray(values, dtype=float)
+        uniq, inverse = np.unique(keys, return_inverse=True)
+        counts = np.bincount(inverse, minlength=uniq.size)
+        means = np.bincount(inverse, weights=values, minlength=uniq.size) / counts
+        dev = values - means[inverse]
+        m2 = np.bincount(inverse, weights=dev * dev, minlength=uniq.size)
+        mins = np.full(uniq.size, np.inf)
+        maxs = np.full(uniq.size, -np.inf)
+        np.minimum.at(mins, inverse, values)
+        np.maximum.at(maxs, inverse, values)
+        for i, k in enumerate(uniq.tolist()):
+            self._get(k).merge(
+                Stats(int(counts[i]), float(means[i]), float(m2[i]), float(mins[i]), float(maxs[i]))
+            )
+
+    def merge(self, other):
+        for k, stats in other._stats.items():
+            self._get(k).merge(stats)
+        return self
+
+    def results(self):
+        return {k: s.result() for k, s in self._stats.items()}
+
+
+def merge_all(aggregators):
+    total = GroupedAggregator()
+    for agg in aggregators:
+        total.merge(agg)
+    return total
+
+
+def main(data):
+    results = {}
+    for key, values in data.items():
+        group = grouper(results, key)
+        next(group)
+        # 整批发送，一次协程恢复
+        group.send(values)
+        group.send(None)
+    return results
+
+
+if __name__ == '__main__':
+    data = {
+        'girls;kg': [40, 41, 42, 43, 44, 54],
+        'girls;m': [1.5, 1.6, 1.8, 1.5, 1.45, 1.6],
+        'boys;kg': [50, 51, 62, 53, 54, 54],
+        'boys;m': [1.6, 1.8, 1.8, 1.7, 1.55, 1.6],
+    }
+    for key, result in sorted(main(data).items()):
+        print(key, result)
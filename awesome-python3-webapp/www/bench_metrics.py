@@ -0,0 +1,67 @@
+__author__ = "MIS-GDK"
+
+"""
+Hot-path cost of the metrics registry.
+
+python3 bench_metrics.py --n 1000000
+"""
+
+import argparse
+import time
+
+from metrics import Registry
+
+
+def bench(name, fn, n):
+    start = time.perf_counter()
+    fn(n)
+    elapsed = time.perf_counter() - start
+    print("%-28s %8.1f ns/op  %12.0f ops/s" % (name, elapsed / n * 1e9, n / elapsed))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="metrics benchmark")
+    parser.add_argument("--n", type=int, default=1000000)
+    parser.add_argument("--routes", type=int, default=20)
+    args = parser.parse_args()
+
+    registry = Registry()
+    plain = registry.counter("plain_total", "plain counter")
+    labeled = registry.counter("labeled_total", "labeled counter", ("method", "route", "status"))
+    hist = registry.histogram("latency_seconds", "latency", ("route",))
+    routes = ["/api/route%d" % i for i in range(args.routes)]
+
+    def baseline(n):
+        for i in range(n):
+            pass
+
+    def plain_inc(n):
+        inc = plain.inc
+        for i in range(n):
+            inc()
+
+    def labeled_inc(n):
+        inc = labeled.inc
+        for i in range(n):
+            inc("GET", routes[i % len(routes)], 200)
+
+    def observe(n):
+        obs = hist.observe
+        for i in range(n):
+            obs((i % 1000) / 10000.0, routes[i % len(routes)])
+
+    bench("loop baseline", baseline, args.n)
+    bench("counter.inc()", plain_inc, args.n)
+    bench("counter.inc(3 labels)", labeled_inc, args.n)
+    bench("histogram.observe(1 label)", observe, args.n)
+
+    start = time.perf_counter()
+    text = registry.expose()
+    print(
+        "expose: %.2f ms for %d lines"
+        % ((time.perf_counter() - start) * 1000, text.count("\n"))
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+__author__ = "MIS-GDK"
+
+"""
+ORM benchmark against the in-process sqlite stand-in.
+
+python3 bench_orm.py --rows 100,1000 --concurrency 1,10,50 --latency 0.001
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+
+import orm
+import sqlite_pool
+from models import User
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, int(round(p / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[k]
+
+
+async def run_concurrent(n, concurrency, make_op):
+    """
+    以concurrency个worker并发执行n次make_op(i)，返回(总耗时, 每次延迟列表)
+    """
+    latencies = []
+    counter = iter(range(n))
+
+    async def worker():
+        for i in counter:
+            t0 = time.perf_counter()
+            await make_op(i)
+            latencies.append(time.perf_counter() - t0)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return time.perf_counter() - start, latencies
+
+
+def report(op, rows, concurrency, elapsed, latencies):
+    latencies.sort()
+    print(
+        "%-10s rows=%-6d conc=%-4d %9.0f ops/s  p50=%7.3fms  p95=%7.3fms  p99=%7.3fms"
+        % (
+            op,
+            rows,
+            concurrency,
+            len(latencies) / elapsed if elapsed else 0.0,
+            percentile(latencies, 50) * 1000,
+            percentile(latencies, 95) * 1000,
+            percentile(latencies, 99) * 1000,
+        )
+    )
+
+
+async def bench(loop, rows, concurrency, latency, maxsize):
+    pool = await orm.create_pool(
+        loop, backend=sqlite_pool, latency=latency, maxsize=maxsize
+    )
+    await sqlite_pool.create_tables(pool, User)
+
+    users = [
+        User(
+            name="User%d" % i,
+            email="user%d@example.com" % i,
+            passwd="1234567890",
+            image="about:blank",
+        )
+        for i in range(rows)
+    ]
+
+    async def save(i):
+        await users[i].save()
+
+    async def find(i):
+        await User.find(users[i].id)
+
+    async def find_all(i):
+        await User.findAll("email=?", [users[i].email], limit=1)
+
+    async def find_number(i):
+        await User.findNumber("count(id)")
+
+    async def update(i):
+        users[i].name = "Updated%d" % i
+        await users[i].update()
+
+    async def remove(i):
+        await users[i].remove()
+
+    for op, fn in [
+        ("save", save),
+        ("find", find),
+        ("findAll", find_all),
+        ("findNumber", find_number),
+        ("update", update),
+        ("remove", remove),
+    ]:
+        elapsed, latencies = await run_concurrent(rows, concurrency, fn)
+        report(op, rows, concurrency, elapsed, latencies)
+
+    await orm.close_pool()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ORM benchmark")
+    parser.add_argument("--rows", default="100,1000")
+    parser.add_argument("--concurrency", default="1,10,50")
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--maxsize", type=int, default=10)
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    for rows in map(int, args.rows.split(",")):
+        for concurrency in map(int, args.concurrency.split(",")):
+            loop.run_until_complete(
+                bench(loop, rows, concurrency, args.latency, args.maxsize)
+            )
+    loop.close()
+
+
+if __name__ == "__main__":
+    main()
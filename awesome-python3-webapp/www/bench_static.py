@@ -0,0 +1,162 @@
+__author__ = "MIS-GDK"
+
+"""
+static files benchmark.
+
+服务器运行在子进程中，同一组文件分别经过：
+1、naive：URL处理函数每次open().read()读入内存，再web.Response(body=data)返回
+2、static：static.add_static注册的路由，小文件从内存返回，大文件web.FileResponse + sendfile
+3、static gzip：请求带Accept-Encoding: gzip，直接发送启动时生成的.gz文件
+客户端也是Python，大文件时可能先达到瓶颈，所以同时给出服务器进程每个请求消耗的CPU时间（Linux）
+
+python3 bench_static.py --connections 20 --duration 3
+"""
+
+import argparse
+import asyncio
+import mimetypes
+import multiprocessing
+import os
+import random
+import tempfile
+
+from aiohttp import web
+
+from loadtest import HTTPConnection, LoadGenerator
+from static import add_static
+
+
+def make_assets(root):
+    # 文本类文件可压缩，图片用随机字节模拟（不可压缩）
+    rnd = random.Random(0)
+    words = ["margin", "padding", "color", "function", "return", "var", "display", "none"]
+    os.makedirs(os.path.join(root, "css"))
+    os.makedirs(os.path.join(root, "js"))
+    os.makedirs(os.path.join(root, "img"))
+    files = {
+        "css/site.css": (20 * 1024, True),
+        "js/app.js": (300 * 1024, True),
+        "img/photo.jpg": (2 * 1024 * 1024, False),
+    }
+    for name, (size, text) in files.items():
+        if text:
+            parts, n = [], 0
+            while n < size:
+                line = " ".join(rnd.choice(words) for _ in range(8)) + ";\n"
+                parts.append(line)
+                n += len(line)
+            data = "".join(parts).encode("utf-8")[:size]
+        else:
+            data = bytes(rnd.getrandbits(8) for _ in range(size))
+        with open(os.path.join(root, name), "wb") as f:
+            f.write(data)
+    return list(files)
+
+
+def naive_handler(root):
+    async def handle(request):
+        path = os.path.join(root, request.match_info["path"])
+        with open(path, "rb") as f:
+            data = f.read()
+        return web.Response(body=data, content_type=mimetypes.guess_type(path)[0])
+
+    return handle
+
+
+def serve(root, q):
+    async def start():
+        app = web.Application()
+        static = add_static(app, root, cache_dir=os.path.join(root, ".compressed"))
+        app.router.add_get("/naive/{path:.+}", naive_handler(root))
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        assets = {
+            asset.name: (asset.url, asset.size, [(e, os.path.getsize(p)) for e, p in asset.variants])
+            for asset in static
+        }
+        q.put((runner.addresses[0][1], assets))
+
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(start())
+    loop.run_forever()
+
+
+async def check(port, url):
+    # 校验Range请求
+    conn = HTTPConnection("127.0.0.1", port, {"Range": "bytes=100-199"})
+    status = await conn.get(url)
+    conn.close()
+    assert status == 206, "range request returned %s" % status
+
+
+def cpu_time(pid):
+    # Linux：子进程已用的CPU时间（秒），其他平台返回None
+    try:
+        with open("/proc/%d/stat" % pid) as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+    except OSError:
+        return None
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+async def run_one(pid, port, path, args, headers=None):
+    gen = LoadGenerator(
+        "127.0.0.1", port, [path], [1], args.connections, args.duration, headers=headers
+    )
+    cpu = cpu_time(pid)
+    elapsed = await gen.run()
+    result = gen.result(elapsed)
+    if cpu is not None and result["requests"]:
+        result["server_cpu_us"] = (cpu_time(pid) - cpu) / result["requests"] * 1e6
+    return result
+
+
+def report(label, result, body_size):
+    print(
+        "%-28s %8.0f req/s  %8.1f MB/s  p50 %6.2f ms  p99 %6.2f ms  server %s  errors %d"
+        % (
+            label,
+            result["rps"],
+            result["rps"] * body_size / 1e6,
+            result["latency_ms"]["p50"],
+            result["latency_ms"]["p99"],
+            "%6.0f us/req" % result["server_cpu_us"] if "server_cpu_us" in result else "-",
+            result["errors"],
+        )
+    )
+
+
+async def bench(pid, port, assets, args):
+    for name in sorted(assets):
+        url, size, variants = assets[name]
+        await check(port, url)
+        print("%s (%d bytes)" % (name, size))
+        report("  naive read()", await run_one(pid, port, "/naive/" + name, args), size)
+        report("  static", await run_one(pid, port, url, args), size)
+        for encoding, compressed in variants:
+            result = await run_one(pid, port, url, args, {"Accept-Encoding": encoding})
+            report("  static %s (%d bytes)" % (encoding, compressed), result, compressed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="static files benchmark")
+    parser.add_argument("--connections", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        make_assets(root)
+        q = multiprocessing.Queue()
+        server = multiprocessing.Process(target=serve, args=(root, q), daemon=True)
+        server.start()
+        port, assets = q.get()
+        try:
+            asyncio.run(bench(server.pid, port, assets, args))
+        finally:
+            server.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,10 @@
 __author__ = "MIS-GDK"
 
-import asyncio, os, inspect, logging, functools
+import asyncio, os, inspect, logging, functools, time
 from urllib import parse
 from aiohttp import web
 from apis import APIError
+import tracing
 
 
 def get(path):
@@ -138,21 +139,24 @@ class RequestHandler(object):
     # 3.如果kw为空（说明request无请求内容），则将match_info列表里的资源映射给kw；若不为空，把命名关键词参数内容给kw
     # 4.完善_has_request_arg和_required_kw_args属性
     async def __call__(self, request):
+        trace = tracing.current()
+        if trace is not None:
+            start = time.perf_counter()
         # 定义kw，用于保存request中参数
         kw = None
         # 若视图函数有命名关键词或关键词参数
         if self._has_var_kw_arg or self._has_named_kw_arg or self._required_kw_args:
             # 判断客户端发来的方法是否为POST
-            if request.metmod == "POST":
+            if request.method == "POST":
                 # 查询有无提交数据的格式（EncType）
                 if not request.content_type:
-                    return web.HTTPBadRequest(text="Missing Content_Type.")
+                    raise web.HTTPBadRequest(text="Missing Content_Type.")
                 ct = request.content_type.lower()
                 if ct.startswith("application/json"):
                     # Read request body decoded as json.
                     params = await request.json()
                     if not isinstance(params, dict):
-                        return web.HTTPBadRequest(text="JSON body must be object.")
+                        raise web.HTTPBadRequest(text="JSON body must be object.")
                     kw = params
                 elif ct.startswith(
                     "application/x-www-form-urlencoded"
@@ -168,7 +172,7 @@ class RequestHandler(object):
                     # 组成dict，统一kw格式
                     kw = dict(**params)
                 else:
-                    return web.HTTPBadRequest(
+                    raise web.HTTPBadRequest(
                         text="Unsupported Content_Tpye: %s" % (request.content_type)
                     )
             if request.method == "GET":
@@ -183,4 +187,91 @@ class RequestHandler(object):
                         kw[k] = v[0]
         if kw is None:
             kw = dict(**request.match_info)
+        else:
+            # 视图函数没有关键词参数而有命名关键词参数时，只保留命名关键词参数
+            if not self._has_var_kw_arg and self._named_kw_args:
+                copy = dict()
+                for name in self._named_kw_args:
+                    if name in kw:
+                        copy[name] = kw[name]
+                kw = copy
+            # 把match_info中的参数合入kw
+            for k, v in request.match_info.items():
+                if k in kw:
+                    logging.warning(
+                        "Duplicate arg name in named arg and kw args: %s" % k
+                    )
+                kw[k] = v
+        if self._has_request_arg:
+            kw["request"] = request
+        # 检查没有默认值的命名关键词参数是否都已提供
+        if self._required_kw_args:
+            for name in self._required_kw_args:
+                if not name in kw:
+                    raise web.HTTPBadRequest(text="Missing argument: %s" % name)
+        logging.debug("call with args: %s" % str(kw))
+        if trace is not None:
+            called = time.perf_counter()
+            trace.bind_time += called - start
+        try:
+            r = await self._func(**kw)
+            return r
+        except APIError as e:
+            return dict(error=e.error, data=e.data, message=e.message)
+        finally:
+            if trace is not None:
+                trace.handler_time += time.perf_counter() - called
+
+
+# 把普通函数（含@get/@post包装过的协程函数）包装成协程，统一以await调用
+def _as_coroutine(fn):
+    @functools.wraps(fn)
+    async def wrapper(*args, **kw):
+        r = fn(*args, **kw)
+        if inspect.isawaitable(r):
+            r = await r
+        return r
+
+    return wrapper
 
+
+# 注册一个URL处理函数
+def add_route(app, fn):
+    method = getattr(fn, "__method__", None)
+    path = getattr(fn, "__route__", None)
+    if path is None or method is None:
+        raise ValueError("@get or @post not defined in %s." % str(fn))
+    if not asyncio.iscoroutinefunction(fn):
+        fn = _as_coroutine(fn)
+    logging.info(
+        "add route %s %s => %s(%s)"
+        % (
+            method,
+            path,
+            fn.__name__,
+            ", ".join(inspect.signature(fn).parameters.keys()),
+        )
+    )
+    # 注册绑定方法__call__：aiohttp只把协程函数当作返回任意值的处理函数，交给中间件转换
+    app.router.add_route(method, path, RequestHandler(app, fn).__call__)
+
+
+# 自动扫描模块，注册所有带@get/@post的函数
+def add_routes(app, module_name):
+    n = module_name.rfind(".")
+    if n == (-1):
+        mod = __import__(module_name, globals(), locals())
+    else:
+        name = module_name[n + 1 :]
+        mod = getattr(
+            __import__(module_name[:n], globals(), locals(), [name]), name
+        )
+    for attr in dir(mod):
+        if attr.startswith("_"):
+            continue
+        fn = getattr(mod, attr)
+        if callable(fn):
+            method = getattr(fn, "__method__", None)
+            path = getattr(fn, "__route__", None)
+            if method and path:
+                add_route(app, fn)
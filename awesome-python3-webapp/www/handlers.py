@@ -0,0 +1,45 @@
+__author__ = "MIS-GDK"
+
+"""
+url handlers
+"""
+
+from aiohttp import web
+
+from coroweb import get
+from metrics import metrics_response
+from models import User
+from static import STATIC
+
+
+@get("/")
+async def index(request):
+    static = request.app.get(STATIC)
+    css = (
+        '<link rel="stylesheet" href="%s">' % static.url("css/awesome.css")
+        if static is not None
+        else ""
+    )
+    return web.Response(text="%s<h1>Awesome</h1>" % css, content_type="text/html")
+
+
+@get("/api/users")
+async def api_get_users():
+    users = await User.findAll(orderBy="created_at desc", limit=20)
+    for u in users:
+        u.passwd = "******"
+    return dict(users=users)
+
+
+@get("/api/users/{id}")
+async def api_get_user(*, id):
+    user = await User.find(id)
+    if user is None:
+        raise web.HTTPNotFound()
+    user.passwd = "******"
+    return user
+
+
+@get("/metrics")
+async def metrics():
+    return metrics_response()
@@ -0,0 +1,314 @@
+__author__ = "MIS-GDK"
+
+"""
+HTTP load generator for the aiohttp app.
+
+启动进程内app（orm使用sqlite替身）并发压测，输出RPS、p50/p95/p99延迟及事件循环延迟，结果保存为JSON：
+
+python3 loadtest.py --connections 50 --duration 10 --mix "/:1,/api/users:3"
+python3 loadtest.py --rate 2000 --output after.json   # 开环：按固定到达率发请求
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+import subprocess
+import time
+
+import orm
+import sqlite_pool
+from app import create_app, start_server
+from models import User
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, int(round(p / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[k]
+
+
+def summarize(values):
+    values = sorted(values)
+    return dict(
+        count=len(values),
+        p50=percentile(values, 50) * 1000,
+        p95=percentile(values, 95) * 1000,
+        p99=percentile(values, 99) * 1000,
+        max=(values[-1] * 1000) if values else 0.0,
+    )
+
+
+def parse_mix(mix):
+    """
+    "/:1,/api/users:3" ==> [('/', 1), ('/api/users', 3)]
+    """
+    paths, weights = [], []
+    for item in mix.split(","):
+        path, _, weight = item.rpartition(":")
+        paths.append(path)
+        weights.append(float(weight))
+    return paths, weights
+
+
+class HTTPConnection(object):
+    """
+    最简HTTP/1.1 keep-alive客户端，避免客户端开销掩盖服务端性能
+    """
+
+    def __init__(self, host, port, headers=None):
+        self._host = host
+        self._port = port
+        # 附加的请求头，如 {"Accept-Encoding": "gzip"}
+        self._extra = "".join("%s: %s\r\n" % kv for kv in (headers or {}).items())
+        self._reader = None
+        self._writer = None
+
+    async def connect(self):
+        self._reader, self._writer = await asyncio.open_connection(
+            self._host, self._port
+        )
+
+    async def get(self, path):
+        if self._writer is None:
+            await self.connect()
+        self._writer.write(
+            (
+                "GET %s HTTP/1.1\r\nHost: %s:%s\r\n%s\r\n"
+                % (path, self._host, self._port, self._extra)
+            ).encode("latin-1")
+        )
+        head = await self._reader.readuntil(b"\r\n\r\n")
+        lines = head.decode("latin-1").split("\r\n")
+        status = int(lines[0].split(" ", 2)[1])
+        headers = {}
+        for line in lines[1:]:
+            if line:
+                k, _, v = line.partition(":")
+                headers[k.strip().lower()] = v.strip()
+        if "content-length" in headers:
+            await self._reader.readexactly(int(headers["content-length"]))
+        elif headers.get("transfer-encoding", "").lower() == "chunked":
+            while True:
+                size = int((await self._reader.readuntil(b"\r\n")).split(b";")[0], 16)
+                await self._reader.readexactly(size + 2)
+                if size == 0:
+                    break
+        if headers.get("connection", "").lower() == "close":
+            self.close()
+        return status
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+class LoadGenerator(object):
+    def __init__(
+        self, host, port, paths, weights, connections, duration, rate=0, headers=None
+    ):
+        self._host = host
+        self._port = port
+        self._headers = headers
+        self._paths = paths
+        self._weights = weights
+        self._connections = connections
+        self._duration = duration
+        # rate>0 为开环（按到达率），否则为闭环（每个连接收到响应后立即发下一个）
+        self._rate = rate
+        self.latencies = {p: [] for p in paths}
+        self.statuses = {}
+        self.errors = 0
+        self.loop_lag = []
+
+    async def _request(self, conn, path, scheduled):
+        try:
+            status = await conn.get(path)
+        except (OSError, asyncio.IncompleteReadError, ValueError):
+            self.errors += 1
+            conn.close()
+            return
+        # 开环模式从计划到达时刻计时，避免协调遗漏(coordinated omission)
+        self.latencies[path].append(time.perf_counter() - scheduled)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+
+    async def _closed_worker(self, deadline):
+        conn = HTTPConnection(self._host, self._port, self._headers)
+        while time.perf_counter() < deadline:
+            path = random.choices(self._paths, self._weights)[0]
+            await self._request(conn, path, time.perf_counter())
+        conn.close()
+
+    async def _open_worker(self, queue):
+        conn = HTTPConnection(self._host, self._port, self._headers)
+        while True:
+            item = await queue.get()
+            if item is None:
+                break
+            await self._request(conn, *item)
+        conn.close()
+
+    async def _arrivals(self, queue, deadline):
+        # 泊松到达：间隔服从指数分布
+        next_at = time.perf_counter()
+        while next_at < deadline:
+            next_at += random.expovariate(self._rate)
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            queue.put_nowait((random.choices(self._paths, self._weights)[0], next_at))
+        for _ in range(self._connections):
+            queue.put_nowait(None)
+
+    async def _monitor_lag(self, deadline, interval=0.01):
+        while time.perf_counter() < deadline:
+            t0 = time.perf_counter()
+            await asyncio.sleep(interval)
+            self.loop_lag.append(max(0.0, time.perf_counter() - t0 - interval))
+
+    async def run(self):
+        start = time.perf_counter()
+        deadline = start + self._duration
+        tasks = [self._monitor_lag(deadline)]
+        if self._rate > 0:
+            queue = asyncio.Queue()
+            tasks.append(self._arrivals(queue, deadline))
+            tasks.extend(self._open_worker(queue) for _ in range(self._connections))
+        else:
+            tasks.extend(self._closed_worker(deadline) for _ in range(self._connections))
+        await asyncio.gather(*tasks)
+        return time.perf_counter() - start
+
+    def result(self, elapsed):
+        all_latencies = [v for values in self.latencies.values() for v in values]
+        return dict(
+            elapsed=elapsed,
+            requests=len(all_latencies),
+            rps=len(all_latencies) / elapsed if elapsed else 0.0,
+            errors=self.errors,
+            statuses={str(k): v for k, v in self.statuses.items()},
+            latency_ms=summarize(all_latencies),
+            paths={p: summarize(v) for p, v in self.latencies.items()},
+            loop_lag_ms=summarize(self.loop_lag),
+        )
+
+
+def git_revision():
+    try:
+        return (
+            subprocess.check_output(
+                ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL
+            )
+            .decode()
+            .strip()
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def seed_users(rows):
+    for i in range(rows):
+        await User(
+            name="User%d" % i,
+            email="user%d@example.com" % i,
+            passwd="1234567890",
+            image="about:blank",
+        ).save()
+
+
+async def run(args, app_factory=create_app):
+    """
+    app_factory: 接受trace_sample_rate，返回待压测的aiohttp Application，便于其他基准复用
+    """
+    loop = asyncio.get_event_loop()
+    runner = None
+    if args.url:
+        host, _, port = args.url.rpartition(":")
+        port = int(port)
+    else:
+        pool = await orm.create_pool(loop, backend=sqlite_pool, latency=args.db_latency)
+        await sqlite_pool.create_tables(pool, User)
+        await seed_users(args.rows)
+        host = "127.0.0.1"
+        runner, port = await start_server(
+            app_factory(trace_sample_rate=args.trace_sample_rate), host, 0
+        )
+
+    paths, weights = parse_mix(args.mix)
+    gen = LoadGenerator(
+        host, port, paths, weights, args.connections, args.duration, args.rate
+    )
+    elapsed = await gen.run()
+    if runner is not None:
+        await runner.cleanup()
+        await orm.close_pool()
+
+    result = gen.result(elapsed)
+    result["config"] = dict(
+        connections=args.connections,
+        duration=args.duration,
+        rate=args.rate,
+        mix=args.mix,
+        rows=args.rows,
+        db_latency=args.db_latency,
+        trace_sample_rate=args.trace_sample_rate,
+    )
+    result["revision"] = git_revision()
+    return result
+
+
+def print_result(result):
+    lat = result["latency_ms"]
+    lag = result["loop_lag_ms"]
+    print(
+        "requests=%d errors=%d statuses=%s rps=%.0f  p50=%.2fms p95=%.2fms p99=%.2fms  loop lag p99=%.2fms max=%.2fms"
+        % (
+            result["requests"],
+            result["errors"],
+            result["statuses"],
+            result["rps"],
+            lat["p50"],
+            lat["p95"],
+            lat["p99"],
+            lag["p99"],
+            lag["max"],
+        )
+    )
+    for path, s in result["paths"].items():
+        print(
+            "  %-20s n=%-7d p50=%.2fms p95=%.2fms p99=%.2fms"
+            % (path, s["count"], s["p50"], s["p95"], s["p99"])
+        )
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="HTTP load generator")
+    parser.add_argument("--connections", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument(
+        "--rate", type=float, default=0, help="open-loop arrival rate (req/s)"
+    )
+    parser.add_argument("--mix", default="/:1,/api/users:3")
+    parser.add_argument("--rows", type=int, default=100)
+    parser.add_argument("--db-latency", type=float, default=0.0)
+    parser.add_argument("--trace-sample-rate", type=float, default=0.01)
+    parser.add_argument("--url", help="host:port of a running server")
+    parser.add_argument("--output", help="save result as JSON")
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+    result = asyncio.run(run(args))
+    print_result(result)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
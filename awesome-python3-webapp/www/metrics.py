@@ -0,0 +1,210 @@
+__author__ = "MIS-GDK"
+
+"""
+In-process metrics registry with Prometheus text exposition.
+
+整个app运行在单个事件循环线程中，计数器/直方图只做普通的dict和list更新，不加锁；
+带标签的序列以标签值tuple为key。聚合（直方图累加、格式化）只在抓取/metrics时进行。
+"""
+
+import time
+from bisect import bisect_left
+
+from aiohttp import web
+
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names, values, extra=""):
+    pairs = ['%s="%s"' % (n, _escape(v)) for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{%s}" % ",".join(pairs) if pairs else ""
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class Counter(object):
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+
+    def inc(self, *labelvalues, amount=1):
+        values = self._values
+        values[labelvalues] = values.get(labelvalues, 0) + amount
+
+    def value(self, *labelvalues):
+        return self._values.get(labelvalues, 0)
+
+    def collect(self):
+        for labelvalues, value in sorted(self._values.items()):
+            yield self.name, _format_labels(self.labelnames, labelvalues), value
+
+
+class Gauge(object):
+    """
+    func不为None时，抓取时调用func()取值，适合连接池等已有状态的对象
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name, documentation, func=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = ()
+        self._func = func
+        self._value = 0
+
+    def set(self, value):
+        self._value = value
+
+    def value(self):
+        return self._func() if self._func is not None else self._value
+
+    def collect(self):
+        value = self.value()
+        if value is not None:
+            yield self.name, "", value
+
+
+class Histogram(object):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._bounds = tuple(sorted(buckets))
+        # labelvalues ==> [各桶计数(非累积，最后一格为+Inf), 总和, 总数]
+        self._series = {}
+
+    def observe(self, value, *labelvalues):
+        series = self._series.get(labelvalues)
+        if series is None:
+            series = self._series[labelvalues] = [[0] * (len(self._bounds) + 1), 0.0, 0]
+        series[0][bisect_left(self._bounds, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def count(self, *labelvalues):
+        series = self._series.get(labelvalues)
+        return series[2] if series else 0
+
+    def collect(self):
+        for labelvalues, (counts, total, count) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, n in zip(self._bounds + (float("inf"),), counts):
+                cumulative += n
+                yield self.name + "_bucket", _format_labels(
+                    self.labelnames, labelvalues, 'le="%s"' % _format_value(bound)
+                ), cumulative
+            labels = _format_labels(self.labelnames, labelvalues)
+            yield self.name + "_sum", labels, total
+            yield self.name + "_count", labels, count
+
+
+class Registry(object):
+    def __init__(self):
+        self._metrics = {}
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError("Duplicate metric: %s" % metric.name)
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, func=None):
+        return self._register(Gauge(name, documentation, func))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def get(self, name):
+        return self._metrics.get(name)
+
+    def expose(self):
+        """
+        Prometheus text format 0.0.4
+        """
+        lines = []
+        for name, metric in sorted(self._metrics.items()):
+            lines.append("# HELP %s %s" % (name, metric.documentation))
+            lines.append("# TYPE %s %s" % (name, metric.kind))
+            for sample, labels, value in metric.collect():
+                lines.append("%s%s %s" % (sample, labels, _format_value(value)))
+        lines.append("")
+        return "\n".join(lines)
+
+
+REGISTRY = Registry()
+
+HTTP_REQUESTS = REGISTRY.counter(
+    "http_requests_total", "HTTP requests by route and status.", ("method", "route", "status")
+)
+HTTP_LATENCY = REGISTRY.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route.", ("route",)
+)
+
+
+def metrics_middleware(registry=REGISTRY):
+    requests = registry.get("http_requests_total")
+    latency = registry.get("http_request_duration_seconds")
+
+    @web.middleware
+    async def middleware(request, handler):
+        start = time.perf_counter()
+        status = 500
+        try:
+            response = await handler(request)
+            status = response.status
+            return response
+        except web.HTTPException as e:
+            status = e.status
+            raise
+        finally:
+            # 用路由模板做标签，避免 /api/users/{id} 按具体id爆炸
+            resource = request.match_info.route.resource
+            route = resource.canonical if resource is not None else "unmatched"
+            requests.inc(request.method, route, status)
+            latency.observe(time.perf_counter() - start, route)
+
+    return middleware
+
+
+def metrics_response(registry=REGISTRY):
+    return web.Response(
+        body=registry.expose().encode("utf-8"),
+        headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"},
+    )
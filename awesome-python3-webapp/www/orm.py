@@ -2,16 +2,35 @@ __author__ = "MIS_GDK"
 
 import asyncio
 import logging
+import time
 import aiomysql
 
+import tracing
+from metrics import REGISTRY
+
+QUERIES = REGISTRY.counter("orm_queries_total", "SQL statements by template.", ("sql",))
+ROWS = REGISTRY.counter("orm_rows_total", "Rows returned or affected by template.", ("sql",))
+ERRORS = REGISTRY.counter("orm_errors_total", "Failed SQL statements by template.", ("sql",))
+QUERY_LATENCY = REGISTRY.histogram(
+    "orm_query_duration_seconds", "SQL latency including pool wait.", ("sql",)
+)
+
 
 def log(sql, args=()):
     logging.info("SQL:%s" % sql)
 
 
+__pool = None
+
+
 async def create_pool(loop, **kw):
     logging.info("create database connection pool")
     global __pool
+    # backend: 可替换的连接池实现（如sqlite_pool），需提供与aiomysql相同接口的create_pool
+    backend = kw.pop("backend", None)
+    if backend is not None:
+        __pool = await backend.create_pool(loop, **kw)
+        return __pool
     __pool = await aiomysql.create_pool(
         host=kw.get("host", "localhost"),
         port=kw.get("port", 3306),
@@ -24,39 +43,114 @@ async def create_pool(loop, **kw):
         minsize=kw.get("minsize", 1),
         loop=loop,
     )
+    return __pool
 
 
-async def select(sql, args, size=None):
-    log(sql)
+async def close_pool():
     global __pool
-    async with __pool.get() as conn:
-        async with conn.cursor(aiomysql.DictCursor) as cur:
-            await cur.execute(sql.replace("?", "%s"), args or ())
-            if size:
-                rs = await cur.fetchmany(size)
-            else:
-                rs = await cur.fetchall()
+    __pool.close()
+    await __pool.wait_closed()
+    __pool = None
+
+
+# 正在执行（含等待连接）的select/execute数，用于计算等待连接的协程数
+__inflight = 0
+
+
+def pool_stats():
+    """
+    连接池状态：size, in_use, free, waiters；未创建连接池时返回None
+    """
+    if __pool is None:
+        return None
+    in_use = __pool.size - __pool.freesize
+    return dict(
+        size=__pool.size,
+        in_use=in_use,
+        free=__pool.freesize,
+        maxsize=__pool.maxsize,
+        waiters=max(0, __inflight - in_use),
+    )
 
-        logging.info("rows returned: %s" % len(rs))
-        return rs
 
+def _pool_stat(key):
+    def value():
+        stats = pool_stats()
+        return stats[key] if stats is not None else None
 
-async def execute(sql, args, autocommit=True):
+    return value
+
+
+for _key in ("size", "in_use", "free", "waiters"):
+    REGISTRY.gauge("db_pool_%s" % _key, "Connection pool %s." % _key, _pool_stat(_key))
+
+
+async def select(sql, args, size=None):
     log(sql)
-    async with __pool.get() as conn:
-        if not autocommit:
-            await conn.begin()
-        try:
+    global __pool, __inflight
+    # 只有被采样的请求才记录trace，未采样时trace为None
+    trace = tracing.current()
+    start = time.perf_counter()
+    __inflight += 1
+    try:
+        async with __pool.get() as conn:
+            if trace is not None:
+                acquired = time.perf_counter()
             async with conn.cursor(aiomysql.DictCursor) as cur:
-                await cur.execute(sql.replace("?", "%s"), args)
-                affected = cur.rowcount
-            if not autocommit:
-                await conn.commit
-        except BaseException as e:
+                await cur.execute(sql.replace("?", "%s"), args or ())
+                if size:
+                    rs = await cur.fetchmany(size)
+                else:
+                    rs = await cur.fetchall()
+    except BaseException:
+        ERRORS.inc(sql)
+        raise
+    finally:
+        __inflight -= 1
+        end = time.perf_counter()
+        QUERIES.inc(sql)
+        QUERY_LATENCY.observe(end - start, sql)
+    ROWS.inc(sql, amount=len(rs))
+    if trace is not None:
+        trace.add_query(acquired - start, end - acquired)
+    logging.info("rows returned: %s" % len(rs))
+    return rs
+
+
+async def execute(sql, args, autocommit=True):
+    log(sql)
+    global __inflight
+    trace = tracing.current()
+    start = time.perf_counter()
+    __inflight += 1
+    try:
+        async with __pool.get() as conn:
+            if trace is not None:
+                acquired = time.perf_counter()
             if not autocommit:
-                await conn.rollback()
-            raise
-        return affected
+                await conn.begin()
+            try:
+                async with conn.cursor(aiomysql.DictCursor) as cur:
+                    await cur.execute(sql.replace("?", "%s"), args)
+                    affected = cur.rowcount
+                if not autocommit:
+                    await conn.commit()
+            except BaseException as e:
+                if not autocommit:
+                    await conn.rollback()
+                raise
+    except BaseException:
+        ERRORS.inc(sql)
+        raise
+    finally:
+        __inflight -= 1
+        end = time.perf_counter()
+        QUERIES.inc(sql)
+        QUERY_LATENCY.observe(end - start, sql)
+    ROWS.inc(sql, amount=affected)
+    if trace is not None:
+        trace.add_query(acquired - start, end - acquired)
+    return affected
 
 
 def create_args_string(num):
@@ -0,0 +1,194 @@
+__author__ = "MIS-GDK"
+
+"""
+SQLite-backed stand-in for aiomysql pool, used by orm.create_pool(backend=sqlite_pool).
+"""
+
+import asyncio
+import logging
+import sqlite3
+
+
+# orm.select/execute 会把 '?' 替换为 aiomysql 的 '%s'，这里再换回 sqlite 的 '?'
+def _to_sqlite(sql):
+    return sql.replace("%s", "?")
+
+
+def _dict_factory(cursor, row):
+    return {col[0]: row[i] for i, col in enumerate(cursor.description)}
+
+
+async def create_pool(loop=None, **kw):
+    """
+    与aiomysql.create_pool参数兼容，额外支持：
+    latency: 每次execute模拟的网络往返时间（秒），默认0
+    """
+    pool = Pool(
+        db=kw.get("db", ":memory:"),
+        minsize=kw.get("minsize", 1),
+        maxsize=kw.get("maxsize", 10),
+        latency=kw.get("latency", 0),
+    )
+    await pool._fill_free()
+    logging.info("sqlite pool created: %s" % pool._database)
+    return pool
+
+
+class Cursor(object):
+    def __init__(self, conn):
+        self._conn = conn
+        self._cur = conn._raw.cursor()
+        self.rowcount = -1
+
+    async def execute(self, sql, args=()):
+        if self._conn._latency:
+            await asyncio.sleep(self._conn._latency)
+        self._cur.execute(_to_sqlite(sql), tuple(args or ()))
+        self.rowcount = self._cur.rowcount
+
+    async def fetchmany(self, size):
+        return self._cur.fetchmany(size)
+
+    async def fetchall(self):
+        return self._cur.fetchall()
+
+    async def close(self):
+        self._cur.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+
+class Connection(object):
+    def __init__(self, database, latency):
+        # isolation_level=None：与aiomysql autocommit=True 行为一致，事务由begin()显式开启
+        self._raw = sqlite3.connect(
+            database, uri=True, isolation_level=None, check_same_thread=False
+        )
+        self._raw.row_factory = _dict_factory
+        self._latency = latency
+
+    def cursor(self, cursor_class=None):
+        # cursor_class 只为兼容 aiomysql.DictCursor，行总是以dict返回
+        return Cursor(self)
+
+    async def begin(self):
+        self._raw.execute("begin")
+
+    async def commit(self):
+        self._raw.execute("commit")
+
+    async def rollback(self):
+        self._raw.execute("rollback")
+
+    def close(self):
+        self._raw.close()
+
+
+class _PoolConnectionContext(object):
+    def __init__(self, pool):
+        self._pool = pool
+        self._conn = None
+
+    async def __aenter__(self):
+        self._conn = await self._pool.acquire()
+        return self._conn
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self._pool.release(self._conn)
+        self._conn = None
+
+
+class Pool(object):
+    def __init__(self, db=":memory:", minsize=1, maxsize=10, latency=0):
+        # 内存库用共享缓存，使池中的多个连接看到同一份数据
+        if db == ":memory:":
+            db = "file:sqlite_pool_%d?mode=memory&cache=shared" % id(self)
+        self._database = db
+        self._minsize = minsize
+        self._maxsize = maxsize
+        self._latency = latency
+        self._free = []
+        self._used = set()
+        self._cond = asyncio.Condition()
+        self._closed = False
+        # 保持一个连接不关闭，否则共享内存库会在最后一个连接关闭时销毁
+        self._keeper = sqlite3.connect(db, uri=True, check_same_thread=False)
+
+    @property
+    def minsize(self):
+        return self._minsize
+
+    @property
+    def maxsize(self):
+        return self._maxsize
+
+    @property
+    def size(self):
+        return len(self._free) + len(self._used)
+
+    @property
+    def freesize(self):
+        return len(self._free)
+
+    async def _fill_free(self):
+        while self.size < self._minsize:
+            self._free.append(Connection(self._database, self._latency))
+
+    async def acquire(self):
+        async with self._cond:
+            while True:
+                if self._free:
+                    conn = self._free.pop()
+                    break
+                if self.size < self._maxsize:
+                    conn = Connection(self._database, self._latency)
+                    break
+                await self._cond.wait()
+            self._used.add(conn)
+            return conn
+
+    def release(self, conn):
+        self._used.discard(conn)
+        if self._closed:
+            conn.close()
+            return
+        self._free.append(conn)
+        asyncio.ensure_future(self._wakeup())
+
+    async def _wakeup(self):
+        async with self._cond:
+            self._cond.notify()
+
+    def get(self):
+        return _PoolConnectionContext(self)
+
+    def close(self):
+        self._closed = True
+        while self._free:
+            self._free.pop().close()
+
+    async def wait_closed(self):
+        self._keeper.close()
+
+
+async def create_tables(pool, *models):
+    """
+    按Model的__mappings__建表，便于本地/CI直接使用orm模型。
+    """
+    async with pool.get() as conn:
+        async with conn.cursor() as cur:
+            for model in models:
+                cols = []
+                for name, field in model.__mappings__.items():
+                    col = "`%s` %s" % (field.name or name, field.column_type)
+                    if field.primary_key:
+                        col += " primary key"
+                    cols.append(col)
+                await cur.execute(
+                    "create table if not exists `%s` (%s)"
+                    % (model.__table__, ", ".join(cols))
+                )
@@ -0,0 +1,284 @@
+__author__ = "MIS-GDK"
+
+"""
+static files.
+
+与coroweb的URL处理函数一起注册到app.router：
+1、启动时扫描静态目录，为每个文件计算内容指纹，生成带指纹的URL：css/awesome.css ==> /static/css/awesome.1a2b3c4d5e.css
+   带指纹的URL内容永不改变，返回 Cache-Control: immutable，浏览器一年内不再请求；原URL返回 no-cache，靠ETag协商
+2、启动时为可压缩的文件预先生成 .gz（装了brotli时还有 .br），请求时按Accept-Encoding直接发送压缩文件，不再每次压缩
+3、大文件和Range请求由web.FileResponse发送：loop.sendfile零拷贝，文件内容不经过Python，
+   Range/If-Range/If-None-Match也由它处理；
+   小文件（及其压缩版本）启动时读入内存直接返回，省去FileResponse每次在线程池中stat/open/close的开销
+4、只响应启动时登记过的文件，请求路径不会拼到文件系统路径上；启动后静态文件视为不变
+"""
+
+import functools
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+
+from aiohttp import web
+
+try:
+    import brotli
+except ImportError:  # 没有brotli时只生成.gz
+    brotli = None
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+COMPRESSIBLE_TYPES = (
+    "application/javascript",
+    "application/json",
+    "application/xml",
+    "image/svg+xml",
+    "application/wasm",
+)
+
+
+def _compressible(content_type):
+    return content_type.startswith("text/") or content_type in COMPRESSIBLE_TYPES
+
+
+@functools.lru_cache(maxsize=256)
+def _parse_accept_encoding(value):
+    """
+    'gzip;q=0.5, br, identity;q=0' ==> {'gzip': 0.5, 'br': 1.0, 'identity': 0.0}
+    浏览器发送的取值很少，解析结果按原字符串缓存
+    """
+    codings = {}
+    for item in value.lower().split(","):
+        coding, _, params = item.partition(";")
+        coding = coding.strip()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            k, _, v = param.partition("=")
+            if k.strip() == "q":
+                try:
+                    q = float(v)
+                except ValueError:
+                    q = 0.0
+        codings[coding] = q
+    return codings
+
+
+def _choose_variant(variants, accept_encoding):
+    # 选q值最高且大于0的预压缩版本（q相同时按variants的顺序）；
+    # 没有列出的编码按 * 的q值；明确给了更高q值的identity时发送原文件
+    codings = _parse_accept_encoding(accept_encoding)
+    star = codings.get("*", 0.0)
+    best, best_q = None, 0.0
+    for encoding, path in variants:
+        q = codings.get(encoding, star)
+        if q > best_q:
+            best, best_q = (encoding, path), q
+    if best is not None and codings.get("identity", 0.0) > best_q:
+        return None
+    return best
+
+
+def _fingerprint(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 16), b""):
+            h.update(block)
+    return h.hexdigest()[:10]
+
+
+def _fingerprinted_name(name, fingerprint):
+    # css/awesome.css ==> css/awesome.<fingerprint>.css
+    base, ext = os.path.splitext(name)
+    return "%s.%s%s" % (base, fingerprint, ext)
+
+
+class Asset(object):
+    __slots__ = ("name", "path", "url", "content_type", "size", "variants", "cached")
+
+    def __init__(self, name, path, url, content_type, size):
+        self.name = name
+        self.path = path
+        self.url = url
+        self.content_type = content_type
+        self.size = size
+        # [(Content-Encoding, 预压缩文件路径)]，按优先顺序
+        self.variants = []
+        # 读入内存的小文件：{Content-Encoding或None: (body, etag, mtime)}
+        self.cached = None
+
+
+def _load(path):
+    # ETag与FileResponse的算法一致，走内存或sendfile时条件请求都能命中
+    st = os.stat(path)
+    with open(path, "rb") as f:
+        body = f.read()
+    return body, "%x-%x" % (st.st_mtime_ns, st.st_size), st.st_mtime
+
+
+class StaticFiles(object):
+    """
+    root: 静态文件目录；prefix: URL前缀；cache_dir: 预压缩文件存放目录，默认为root下的.compressed；
+    min_size: 小于该字节数的文件不压缩；min_ratio: 压缩后不小于原大小的该比例时不保留压缩文件；
+    memory_max_size: 不超过该字节数的文件读入内存；memory_limit: 读入内存的总字节数上限，0表示全部用sendfile
+    """
+
+    def __init__(
+        self,
+        root,
+        prefix="/static/",
+        cache_dir=None,
+        min_size=256,
+        min_ratio=0.9,
+        memory_max_size=512 * 1024,
+        memory_limit=16 * 1024 * 1024,
+    ):
+        self.root = os.path.abspath(root)
+        self.prefix = "/" + prefix.strip("/") + "/"
+        self.cache_dir = cache_dir or os.path.join(self.root, ".compressed")
+        self.min_size = min_size
+        self.min_ratio = min_ratio
+        self.memory_max_size = memory_max_size
+        self.memory_limit = memory_limit
+        self.memory_used = 0
+        self._assets = {}  # 原路径 ==> Asset
+        self._fingerprinted = {}  # 带指纹的路径 ==> Asset
+
+    def build(self):
+        """
+        扫描root，计算指纹并生成预压缩文件；已存在的同指纹压缩文件直接复用
+        """
+        self._assets.clear()
+        self._fingerprinted.clear()
+        self.memory_used = 0
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            # 跳过隐藏目录（包括cache_dir）
+            dirnames[:] = [d for d in dirnames if not d.startswith(".")]
+            for filename in filenames:
+                if filename.startswith("."):
+                    continue
+                path = os.path.join(dirpath, filename)
+                name = os.path.relpath(path, self.root).replace(os.sep, "/")
+                self._add(name, path)
+        logging.info(
+            "static: %d files under %s, %d precompressed, %d in memory (%d bytes)"
+            % (
+                len(self._assets),
+                self.root,
+                sum(1 for a in self._assets.values() if a.variants),
+                sum(1 for a in self._assets.values() if a.cached),
+                self.memory_used,
+            )
+        )
+        return self
+
+    def _add(self, name, path):
+        content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+        if content_type.startswith("text/") or content_type == "application/javascript":
+            content_type += "; charset=utf-8"
+        fingerprinted = _fingerprinted_name(name, _fingerprint(path))
+        size = os.path.getsize(path)
+        asset = Asset(name, path, self.prefix + fingerprinted, content_type, size)
+        if size >= self.min_size and _compressible(content_type):
+            self._compress(asset, fingerprinted)
+        if size <= self.memory_max_size:
+            self._cache(asset)
+        self._assets[name] = asset
+        self._fingerprinted[fingerprinted] = asset
+
+    def _compress(self, asset, fingerprinted):
+        with open(asset.path, "rb") as f:
+            data = f.read()
+        encoders = []
+        if brotli is not None:
+            encoders.append(("br", ".br", lambda d: brotli.compress(d, quality=11)))
+        encoders.append(("gzip", ".gz", lambda d: gzip.compress(d, 9, mtime=0)))
+        for encoding, ext, compress in encoders:
+            # 文件名带指纹，内容变化后自然生成新文件
+            target = os.path.join(self.cache_dir, fingerprinted + ext)
+            if not os.path.exists(target):
+                compressed = compress(data)
+                if len(compressed) >= len(data) * self.min_ratio:
+                    continue
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                tmp = target + ".tmp"
+                with open(tmp, "wb") as f:
+                    f.write(compressed)
+                os.replace(tmp, target)
+            asset.variants.append((encoding, target))
+
+    def _cache(self, asset):
+        paths = [(None, asset.path)] + asset.variants
+        total = sum(os.path.getsize(p) for _, p in paths)
+        if self.memory_used + total > self.memory_limit:
+            return
+        asset.cached = {encoding: _load(p) for encoding, p in paths}
+        self.memory_used += total
+
+    def url(self, name):
+        """
+        模板中引用静态文件：static.url('css/awesome.css') ==> '/static/css/awesome.1a2b3c4d5e.css'
+        """
+        return self._assets[name].url
+
+    def __iter__(self):
+        return iter(self._assets.values())
+
+    async def handle(self, request):
+        name = request.match_info["path"]
+        asset = self._fingerprinted.get(name)
+        if asset is not None:
+            cache_control = IMMUTABLE
+        else:
+            asset = self._assets.get(name)
+            if asset is None:
+                raise web.HTTPNotFound()
+            cache_control = REVALIDATE
+        headers = {"Cache-Control": cache_control, "Content-Type": asset.content_type}
+        ranged = "Range" in request.headers
+        encoding, path = None, asset.path
+        if asset.variants:
+            headers["Vary"] = "Accept-Encoding"
+            # Range请求总是针对原文件，便于断点续传和媒体拖动
+            accept = request.headers.get("Accept-Encoding")
+            if not ranged and accept:
+                chosen = _choose_variant(asset.variants, accept)
+                if chosen is not None:
+                    encoding, path = chosen
+                    headers["Content-Encoding"] = encoding
+        if asset.cached is None or ranged:
+            return web.FileResponse(path, headers=headers)
+        body, etag, mtime = asset.cached[encoding]
+        if _not_modified(request, etag, mtime):
+            resp = web.Response(status=304, headers=headers)
+        else:
+            headers["Accept-Ranges"] = "bytes"
+            resp = web.Response(body=body, headers=headers)
+        resp.etag = etag
+        resp.last_modified = mtime
+        return resp
+
+
+def _not_modified(request, etag, mtime):
+    if request.if_none_match is not None:
+        return any(e.value == etag or e.value == "*" for e in request.if_none_match)
+    if request.if_modified_since is not None:
+        return mtime <= request.if_modified_since.timestamp()
+    return False
+
+
+STATIC = web.AppKey("static", StaticFiles)
+
+
+def add_static(app, root, prefix="/static/", **kw):
+    """
+    注册静态文件路由，StaticFiles实例保存在app[STATIC]中
+    """
+    static = StaticFiles(root, prefix, **kw).build()
+    app[STATIC] = static
+    app.router.add_get(static.prefix + "{path:.+}", static.handle)
+    logging.info("add static %s => %s" % (static.prefix, static.root))
+    return static
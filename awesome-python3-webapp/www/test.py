@@ -1,22 +1,30 @@
 import orm
+import sqlite_pool
 from models import User, Blog, Comment
 import asyncio
+import sys
 
 
-async def gdk_test(loop):
-    await orm.create_pool(
-        loop,
-        user="www-data",
-        password="www-data",
-        db="awesome",
-        host="192.168.0.190",
-        port=3306,
-    )
+async def gdk_test(loop, backend=None):
+    if backend == "sqlite":
+        # 本地/CI：使用进程内sqlite替身，无需MySQL
+        pool = await orm.create_pool(loop, backend=sqlite_pool)
+        await sqlite_pool.create_tables(pool, User, Blog, Comment)
+    else:
+        await orm.create_pool(
+            loop,
+            user="www-data",
+            password="www-data",
+            db="awesome",
+            host="192.168.0.190",
+            port=3306,
+        )
 
     u = User(
         name="Test", email="test5@example.com", passwd="1234567890", image="about:blank"
     )
     await u.save()
+    print(await User.findNumber("count(id)"))
 
 
 def add(x):
@@ -24,7 +32,8 @@ def add(x):
 
 
 # 要运行协程，需要使用事件循环
+# python3 test.py sqlite  使用sqlite替身运行
 if __name__ == "__main__":
-    loop = asyncio.get_event_loop()
-    loop.run_until_complete(gdk_test(loop))
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(gdk_test(loop, sys.argv[1] if len(sys.argv) > 1 else None))
     print("Test finished.")
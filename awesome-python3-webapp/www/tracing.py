@@ -0,0 +1,103 @@
+__author__ = "MIS-GDK"
+
+"""
+Request-scoped tracing: per-request DB time, query count and handler time.
+
+tracing_middleware 为被采样的请求在contextvars中建立RequestTrace，
+orm.select/execute 和 coroweb.RequestHandler 向其上报耗时，响应时写出Server-Timing头和结构化日志。
+未采样的请求 current() 返回None，上报方直接跳过，开销只有一次ContextVar.get()。
+"""
+
+import json
+import logging
+import random
+import time
+from contextvars import ContextVar
+
+from aiohttp import web
+
+logger = logging.getLogger("tracing")
+
+_current = ContextVar("request_trace", default=None)
+
+
+def current():
+    """
+    当前请求的RequestTrace，未采样时为None
+    """
+    return _current.get()
+
+
+class RequestTrace(object):
+    __slots__ = ("start", "queries", "db_time", "pool_wait", "bind_time", "handler_time")
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.pool_wait = 0.0
+        self.bind_time = 0.0
+        self.handler_time = 0.0
+
+    def add_query(self, pool_wait, db_time):
+        self.queries += 1
+        self.pool_wait += pool_wait
+        self.db_time += db_time
+
+    def server_timing(self, total):
+        return (
+            'bind;dur=%.3f, handler;dur=%.3f, db;dur=%.3f;desc="%d queries", '
+            "pool;dur=%.3f, total;dur=%.3f"
+            % (
+                self.bind_time * 1000,
+                self.handler_time * 1000,
+                self.db_time * 1000,
+                self.queries,
+                self.pool_wait * 1000,
+                total * 1000,
+            )
+        )
+
+    def as_dict(self, total):
+        return dict(
+            total_ms=round(total * 1000, 3),
+            bind_ms=round(self.bind_time * 1000, 3),
+            handler_ms=round(self.handler_time * 1000, 3),
+            db_ms=round(self.db_time * 1000, 3),
+            pool_wait_ms=round(self.pool_wait * 1000, 3),
+            queries=self.queries,
+        )
+
+
+def tracing_middleware(sample_rate=1.0):
+    """
+    sample_rate: 被追踪请求的比例，1.0全部追踪，0关闭
+    """
+
+    @web.middleware
+    async def middleware(request, handler):
+        if sample_rate < 1.0 and random.random() >= sample_rate:
+            return await handler(request)
+        trace = RequestTrace()
+        token = _current.set(trace)
+        status = 500
+        try:
+            response = await handler(request)
+            status = response.status
+            total = time.perf_counter() - trace.start
+            if not response.prepared:
+                response.headers["Server-Timing"] = trace.server_timing(total)
+            return response
+        except web.HTTPException as e:
+            # 404/400等错误页同样带上Server-Timing
+            status = e.status
+            e.headers["Server-Timing"] = trace.server_timing(time.perf_counter() - trace.start)
+            raise
+        finally:
+            _current.reset(token)
+            if logger.isEnabledFor(logging.INFO):
+                info = trace.as_dict(time.perf_counter() - trace.start)
+                info.update(method=request.method, path=request.path, status=status)
+                logger.info("trace %s" % json.dumps(info))
+
+    return middleware
@@ -0,0 +1,116 @@
+#! -*- coding: utf-8 -*-
+
+import argparse
+import random
+import time
+from array import array
+from multiprocessing import Pool
+
+import aggregator
+from aggregator import GroupedAggregator, merge_all
+from python_coroutine4 import averager as element_averager
+
+# 对比python_coroutine4逐个send与aggregator按批send/分组批量聚合/多进程合并
+#
+# python3 bench_aggregator.py --values 2000000 --keys 8 --chunk 100000
+
+
+def element_grouper(results, key):
+    # 与python_coroutine4.grouper相同，去掉了每轮的print
+    while True:
+        results[key] = yield from element_averager()
+
+
+def run_element(data):
+    results = {}
+    for key, values in data.items():
+        group = element_grouper(results, key)
+        next(group)
+        for value in values:
+            group.send(value)
+        group.send(None)
+    return results
+
+
+def run_batched(data, chunk):
+    results = {}
+    for key, values in data.items():
+        group = aggregator.grouper(results, key)
+        next(group)
+        for i in range(0, len(values), chunk):
+            group.send(values[i : i + chunk])
+        group.send(None)
+    return results
+
+
+def run_pairs(keys, values, chunk):
+    agg = GroupedAggregator()
+    for i in range(0, len(values), chunk):
+        agg.update_pairs(keys[i : i + chunk], values[i : i + chunk])
+    return agg.results()
+
+
+def _aggregate_part(args):
+    keys, values, chunk = args
+    agg = GroupedAggregator()
+    for i in range(0, len(values), chunk):
+        agg.update_pairs(keys[i : i + chunk], values[i : i + chunk])
+    return agg
+
+
+def run_processes(keys, values, chunk, processes):
+    step = (len(values) + processes - 1) // processes
+    parts = [(keys[i : i + step], values[i : i + step], chunk) for i in range(0, len(values), step)]
+    with Pool(processes) as pool:
+        return merge_all(pool.map(_aggregate_part, parts)).results()
+
+
+def measure(name, fn, n):
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    print('%-34s %7.3fs  %12.0f values/s' % (name, elapsed, n / elapsed))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='grouped aggregation benchmark')
+    parser.add_argument('--values', type=int, default=2000000)
+    parser.add_argument('--keys', type=int, default=8)
+    parser.add_argument('--chunk', type=int, default=100000)
+    parser.add_argument('--processes', type=int, default=4)
+    args = parser.parse_args()
+
+    rnd = random.Random(0)
+    keys = array('l', (rnd.randrange(args.keys) for _ in range(args.values)))
+    values = array('d', (rnd.gauss(50, 10) for _ in range(args.values)))
+    data = {}
+    for k, v in zip(keys, values):
+        data.setdefault(k, array('d')).append(v)
+    if aggregator.np is not None:
+        np = aggregator.np
+        np_keys, np_values = np.frombuffer(keys, dtype=keys.typecode), np.frombuffer(values)
+    print('numpy: %s' % ('yes' if aggregator.np is not None else 'no'))
+
+    base = measure('per-element send (coroutine4)', lambda: run_element(data), args.values)
+    batched = measure(
+        'batched send (chunk=%d)' % args.chunk, lambda: run_batched(data, args.chunk), args.values
+    )
+    list_data = {k: v.tolist() for k, v in data.items()}
+    measure('batched send (list chunks)', lambda: run_batched(list_data, args.chunk), args.values)
+    if aggregator.np is not None:
+        measure('update_pairs (numpy)', lambda: run_pairs(np_keys, np_values, args.chunk), args.values)
+        measure(
+            'update_pairs (numpy, %d processes)' % args.processes,
+            lambda: run_processes(np_keys, np_values, args.chunk, args.processes),
+            args.values,
+        )
+    list_keys, list_values = keys.tolist(), values.tolist()
+    measure('update_pairs (lists)', lambda: run_pairs(list_keys, list_values, args.chunk), args.values)
+    for k in base:
+        assert base[k].count == batched[k].count
+        assert abs(base[k].average - batched[k].mean) < 1e-9 * abs(base[k].average)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+import argparse
+import asyncio
+import time
+
+from coropipe import compose, counter, drive_from_queue, map_, send_each
+
+# 对比推送式协程流水线（逐个send / 按批send / asyncio队列驱动）与普通生成器链的事件吞吐
+#
+# python3 bench_coropipe.py --events 1000000 --stages 1,4,16 --batch 1024
+
+
+def inc(x):
+    return x + 1
+
+
+def generator_chain(events, stages):
+    g = iter(events)
+    for _ in range(stages):
+        g = (inc(x) for x in g)
+    n = 0
+    for _ in g:
+        n += 1
+    return n
+
+
+def push(events, stages, batch):
+    result = {}
+    head = compose(*[map_(inc) for _ in range(stages)], target=counter(result))
+    if batch == 1:
+        send_each(head, events)
+    else:
+        for i in range(0, len(events), batch):
+            head.send(events[i : i + batch])
+    head.close()
+    return result['count']
+
+
+def push_from_queue(events, stages, batch):
+    async def run():
+        result = {}
+        q = asyncio.Queue()
+        for x in events:
+            q.put_nowait(x)
+        q.put_nowait(None)
+        head = compose(*[map_(inc) for _ in range(stages)], target=counter(result))
+        await drive_from_queue(q, head, batch)
+        return result['count']
+
+    return asyncio.run(run())
+
+
+def measure(name, fn, n):
+    start = time.perf_counter()
+    count = fn()
+    elapsed = time.perf_counter() - start
+    assert count == n
+    print('%-36s %7.3fs  %12.0f events/s' % (name, elapsed, n / elapsed))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='coroutine pipeline benchmark')
+    parser.add_argument('--events', type=int, default=1000000)
+    parser.add_argument('--stages', default='1,4,16')
+    parser.add_argument('--batch', type=int, default=1024)
+    args = parser.parse_args()
+
+    events = list(range(args.events))
+    n = len(events)
+    for stages in map(int, args.stages.split(',')):
+        measure('stages=%-2d generator chain' % stages, lambda: generator_chain(events, stages), n)
+        measure('stages=%-2d push, send each' % stages, lambda: push(events, stages, 1), n)
+        measure(
+            'stages=%-2d push, batch=%d' % (stages, args.batch),
+            lambda: push(events, stages, args.batch),
+            n,
+        )
+        measure(
+            'stages=%-2d asyncio queue, batch=%d' % (stages, args.batch),
+            lambda: push_from_queue(events, stages, args.batch),
+            n,
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+import argparse
+import asyncio
+import multiprocessing
+import os
+import socket
+import tempfile
+import time
+import tracemalloc
+
+from fetcher import Fetcher
+
+# 离线基准：本地启动HTTP测试服务器，对比
+# 1、tcp.py原来的阻塞写法：每个URL新建连接，recv(1024) 追加到list，b''.join 后一次性写文件
+# 2、fetcher.Fetcher：keep-alive连接池 + recv_into预分配缓冲区 + 流式写文件，有界并发
+#
+# python3 bench_fetcher.py --urls 200 --size 524288 --concurrency 20
+
+
+async def handle(reader, writer, payload):
+    # 测试服务器：/length/<n> 用Content-Length，/chunked/<n> 用chunked编码
+    try:
+        while True:
+            head = await reader.readuntil(b"\r\n\r\n")
+            path = head.split(b" ", 2)[1].decode()
+            mode, size = path.strip("/").split("/")
+            body = payload[: int(size)]
+            close = b"connection: close" in head.lower()
+            conn = b"close" if close else b"keep-alive"
+            if mode == "chunked":
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\nConnection: %s\r\n\r\n"
+                    % conn
+                )
+                for i in range(0, len(body), 16384):
+                    chunk = body[i : i + 16384]
+                    writer.write(b"%x\r\n" % len(chunk) + chunk + b"\r\n")
+                writer.write(b"0\r\n\r\n")
+            else:
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Length: %d\r\nConnection: %s\r\n\r\n"
+                    % (len(body), conn)
+                )
+                writer.write(body)
+            await writer.drain()
+            if close:
+                break
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    writer.close()
+
+
+def make_payload(size):
+    return (bytes(range(256)) * (size // 256 + 1))[:size]
+
+
+def serve(max_size, q):
+    payload = make_payload(max_size)
+    loop = asyncio.new_event_loop()
+    server = loop.run_until_complete(
+        asyncio.start_server(lambda r, w: handle(r, w, payload), "127.0.0.1", 0)
+    )
+    q.put(server.sockets[0].getsockname()[1])
+    loop.run_forever()
+
+
+# 服务器运行在子进程中，避免占用客户端的CPU和内存统计
+def start_server(max_size):
+    q = multiprocessing.Queue()
+    p = multiprocessing.Process(target=serve, args=(max_size, q), daemon=True)
+    p.start()
+    return p, q.get()
+
+
+def blocking_fetch(port, path, out):
+    s = socket.socket()
+    s.connect(("127.0.0.1", port))
+    s.send(b"GET %s HTTP/1.1\r\nHost: 127.0.0.1\r\nConnection: close\r\n\r\n" % path.encode())
+    buffer = []
+    while True:
+        d = s.recv(1024)
+        if d:
+            buffer.append(d)
+        else:
+            break
+    data = b"".join(buffer)
+    s.close()
+    header, html = data.split(b"\r\n\r\n", 1)
+    with open(out, "wb") as f:
+        f.write(html)
+
+
+def run_blocking(port, paths, tmpdir):
+    for i, path in enumerate(paths):
+        blocking_fetch(port, path, os.path.join(tmpdir, "b%d.html" % i))
+
+
+async def run_fetcher(port, paths, tmpdir, concurrency):
+    async with Fetcher(limit=concurrency, limit_per_host=concurrency) as fetcher:
+        results = await fetcher.fetch_many(
+            [
+                ("http://127.0.0.1:%d%s" % (port, path), os.path.join(tmpdir, "f%d.html" % i))
+                for i, path in enumerate(paths)
+            ]
+        )
+    errors = [r for r in results if isinstance(r, BaseException)]
+    if errors:
+        raise errors[0]
+
+
+def measure(name, fn, total_bytes, memory):
+    if memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    peak = 0
+    if memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    print(
+        "%-22s %7.3fs  %8.1f MB/s%s"
+        % (
+            name,
+            elapsed,
+            total_bytes / elapsed / 1e6,
+            ("  peak %.1f KB" % (peak / 1024.0)) if memory else "",
+        )
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="fetcher benchmark")
+    parser.add_argument("--urls", type=int, default=200)
+    parser.add_argument("--size", type=int, default=512 * 1024)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--mode", choices=("length", "chunked"), default="length")
+    parser.add_argument("--memory", action="store_true", help="report tracemalloc peak")
+    args = parser.parse_args()
+
+    server, port = start_server(args.size)
+    paths = ["/%s/%d" % (args.mode, args.size)] * args.urls
+    total = args.urls * args.size
+    with tempfile.TemporaryDirectory() as tmpdir:
+        measure("blocking recv(1024)", lambda: run_blocking(port, paths, tmpdir), total, args.memory)
+        measure(
+            "fetcher (c=%d)" % args.concurrency,
+            lambda: asyncio.run(run_fetcher(port, paths, tmpdir, args.concurrency)),
+            total,
+            args.memory,
+        )
+        # 阻塞写法不解码chunked，只在length模式下校验它的输出
+        expected = make_payload(args.size)
+        for i in range(args.urls):
+            names = ["f%d.html"] if args.mode == "chunked" else ["f%d.html", "b%d.html"]
+            for name in names:
+                with open(os.path.join(tmpdir, name % i), "rb") as f:
+                    assert f.read() == expected, "body mismatch: %s" % (name % i)
+    server.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import argparse
+import time
+
+from flatten import flatten, flatten_chunks
+from python_coroutine3 import flatten as recursive_flatten
+
+# 对比python_coroutine3递归版与flatten.py非递归版：
+# 1、wide：大量元素，浅嵌套
+# 2、deep：深度嵌套，递归版会触发RecursionError
+# 3、mixed：含str、tuple、set、range等类型
+#
+# python3 bench_flatten.py --wide 1000000 --deep 100000
+
+
+def make_wide(n, width=10):
+    return [list(range(i, i + width)) for i in range(0, n, width)]
+
+
+def make_deep(depth):
+    deep = [0]
+    for i in range(1, depth):
+        deep = [deep, i]
+    return deep
+
+
+def make_mixed(n):
+    return [(i, 'name%d' % i, [i * 1.5, {i}], range(3), b'x') for i in range(n // 7)]
+
+
+def consume(it):
+    n = 0
+    for _ in it:
+        n += 1
+    return n
+
+
+def consume_chunks(it):
+    n = 0
+    for chunk in it:
+        n += len(chunk)
+    return n
+
+
+def measure(name, fn):
+    start = time.perf_counter()
+    try:
+        n = fn()
+    except RecursionError:
+        print('%-32s RecursionError' % name)
+        return
+    elapsed = time.perf_counter() - start
+    print('%-32s %7.3fs  %12.0f items/s' % (name, elapsed, n / elapsed))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='flatten benchmark')
+    parser.add_argument('--wide', type=int, default=1000000)
+    parser.add_argument('--deep', type=int, default=100000)
+    parser.add_argument('--chunk', type=int, default=4096)
+    args = parser.parse_args()
+
+    for label, data in (
+        ('wide', make_wide(args.wide)),
+        ('deep', make_deep(args.deep)),
+        ('mixed', make_mixed(args.wide)),
+    ):
+        measure('%s recursive' % label, lambda: consume(recursive_flatten(data)))
+        measure('%s iterative' % label, lambda: consume(flatten(data)))
+        measure(
+            '%s iterative chunks=%d' % (label, args.chunk),
+            lambda: consume_chunks(flatten_chunks(data, args.chunk)),
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+from html_index import Index, IndexWriter, PageExtractor, extract_file
+
+# 在已保存的页面（默认sina.html）上对比：
+# 1、full：原来的做法，整页读入内存、整体解码后一次性解析
+# 2、stream：按块（模拟Fetcher每次交给sink的数据）增量解码、增量解析
+# 3、index：从mmap索引中查出标题和链接，不再解析HTML
+#
+# python3 bench_html_index.py --page sina.html --chunk 65536 --repeat 20
+
+URL = "https://www.sina.com.cn/"
+
+
+def parse_full(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    extractor = PageExtractor(URL)
+    extractor(data)
+    return extractor.close()
+
+
+def lookup(path):
+    with Index(path) as index:
+        page = index[URL]
+        return page.title, page.links
+
+
+def measure(name, fn, repeat):
+    fn()  # 预热
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print("%-24s %9.3f ms  peak %8.1f KB" % (name, best * 1000, peak / 1024.0))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="html extraction/index benchmark")
+    parser.add_argument("--page", default="sina.html")
+    parser.add_argument("--chunk", type=int, default=64 * 1024)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    page = parse_full(args.page)
+    streamed = extract_file(args.page, URL, chunk_size=args.chunk)
+    assert streamed == page, "streaming result differs from full parse"
+    print(
+        "%s: %d bytes, charset %s, title %r, %d links, %d chars of text"
+        % (args.page, os.path.getsize(args.page), page.charset, page.title, len(page.links), len(page.text))
+    )
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        idx = os.path.join(tmpdir, "pages.idx")
+        with IndexWriter(idx) as writer:
+            writer.add(page)
+        print("index: %d bytes" % os.path.getsize(idx))
+        measure("full parse", lambda: parse_full(args.page), args.repeat)
+        measure(
+            "stream chunk=%d" % args.chunk,
+            lambda: extract_file(args.page, URL, chunk_size=args.chunk),
+            args.repeat,
+        )
+        measure("index lookup", lambda: lookup(idx), args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+import argparse
+import time
+
+from pipeline import Pipeline, Source, Stage
+
+# 流水线吞吐基准：
+# 1、小数据：比较不同batch_size和工作进程数下的条/秒（batch_size=1 相当于asynico1.py逐条put/get）
+# 2、大数据：比较大块bytes经队列pickle传递与经共享内存传递
+#
+# python3 bench_pipeline.py --items 200000 --batch-sizes 1,16,256 --workers 1,2,4
+
+N_ITEMS = 0
+PAYLOAD = 0
+
+
+def numbers(index, workers):
+    return range(index, N_ITEMS, workers)
+
+
+def blobs(index, workers):
+    for i in range(index, N_ITEMS, workers):
+        yield bytes(PAYLOAD)
+
+
+def square(x):
+    return x * x
+
+
+def checksum(data):
+    # 只读一个字节，避免处理时间掩盖传输开销
+    return len(data) + data[-1]
+
+
+def run(source, stages, **kw):
+    start = time.perf_counter()
+    count = 0
+    for _ in Pipeline(source, stages, **kw).run():
+        count += 1
+    return count, time.perf_counter() - start
+
+
+def main():
+    global N_ITEMS, PAYLOAD
+    parser = argparse.ArgumentParser(description='pipeline benchmark')
+    parser.add_argument('--items', type=int, default=200000)
+    parser.add_argument('--batch-sizes', default='1,16,256')
+    parser.add_argument('--workers', default='1,2,4')
+    parser.add_argument('--blobs', type=int, default=200)
+    parser.add_argument('--blob-size', type=int, default=4 << 20)
+    args = parser.parse_args()
+
+    N_ITEMS = args.items
+    for workers in map(int, args.workers.split(',')):
+        for batch_size in map(int, args.batch_sizes.split(',')):
+            count, elapsed = run(
+                Source(numbers, workers=workers),
+                [Stage(square, workers=workers)],
+                batch_size=batch_size,
+            )
+            assert count == N_ITEMS
+            print(
+                'small  workers=%d batch=%-4d %8.0f items/s  (%.2fs)'
+                % (workers, batch_size, count / elapsed, elapsed)
+            )
+
+    N_ITEMS, PAYLOAD = args.blobs, args.blob_size
+    for label, threshold in (('pickle', None), ('shm', 1 << 20)):
+        count, elapsed = run(
+            Source(blobs, workers=2),
+            [Stage(checksum, workers=2)],
+            batch_size=4,
+            shm_threshold=threshold,
+        )
+        assert count == N_ITEMS
+        print(
+            'blobs  %-6s %d x %d KB  %8.1f MB/s  (%.2fs)'
+            % (label, count, PAYLOAD >> 10, count * PAYLOAD / elapsed / 1e6, elapsed)
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+import argparse
+import asyncio
+import time
+
+import framing
+from bench_tcp_server import start_server
+from tcp_pool_client import ClientPool, PipelinedConnection
+
+# 对比tcp_client.py式的一发一收与流水线客户端的吞吐（服务器以 --framing length 运行在子进程中）：
+#
+# python3 bench_tcp_client.py --messages 100000 --pool 4
+
+
+async def lockstep(port, names):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    await framing.read_frame(reader)
+    for name in names:
+        framing.write_frame(writer, name)
+        await framing.read_frame(reader)
+    framing.write_frame(writer, b'exit')
+    writer.close()
+
+
+async def pipelined_send(port, names, window):
+    # 单连接，最多window个未完成请求，逐条await
+    conn = PipelinedConnection('127.0.0.1', port, max_pending=window)
+    await conn.connect()
+    sem = asyncio.Semaphore(window)
+
+    async def one(name):
+        async with sem:
+            return await conn.send(name)
+
+    await asyncio.gather(*[one(name) for name in names])
+    await conn.close()
+
+
+async def pool_send_many(port, names, size):
+    async with ClientPool('127.0.0.1', port, size=size) as pool:
+        replies = await pool.send_many(names)
+    assert replies[-1] == b'Hello, %s!' % names[-1]
+
+
+def measure(name, coro, n):
+    start = time.perf_counter()
+    asyncio.run(coro)
+    elapsed = time.perf_counter() - start
+    print('%-28s %7.3fs  %10.0f msg/s' % (name, elapsed, n / elapsed))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='pipelined client benchmark')
+    parser.add_argument('--messages', type=int, default=50000)
+    parser.add_argument('--pool', type=int, default=4)
+    parser.add_argument('--window', type=int, default=256)
+    parser.add_argument('--port', type=int, default=9999)
+    args = parser.parse_args()
+
+    server_args = argparse.Namespace(
+        port=args.port, mode='async', backlog=128, max_connections=1000, framing='length'
+    )
+    proc = start_server(server_args)
+    names = [b'Client%d' % i for i in range(args.messages)]
+    try:
+        measure('lock-step (tcp_client.py)', lockstep(args.port, names), len(names))
+        measure(
+            'pipelined send (window=%d)' % args.window,
+            pipelined_send(args.port, names, args.window),
+            len(names),
+        )
+        measure('send_many (1 conn)', pool_send_many(args.port, names, 1), len(names))
+        measure(
+            'send_many (pool=%d)' % args.pool,
+            pool_send_many(args.port, names, args.pool),
+            len(names),
+        )
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+import argparse
+import asyncio
+import socket
+import subprocess
+import sys
+import time
+
+import framing
+
+# 并发客户端基准：每个客户端按tcp_client.py的方式连接、收欢迎消息、逐个发送名字并等待回复，最后发送exit。
+# 服务器在子进程中运行，可对比线程模式和asyncio模式：
+#
+# python3 bench_tcp_server.py --mode async --clients 2000 --messages 10
+# python3 bench_tcp_server.py --mode thread --clients 2000 --messages 10
+# python3 bench_tcp_server.py --mode async --framing length
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, int(round(p / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[k]
+
+
+def start_server(args):
+    cmd = [
+        sys.executable, 'tcp_server.py',
+        '--port', str(args.port),
+        '--mode', args.mode,
+        '--backlog', str(args.backlog),
+        '--max-connections', str(args.max_connections),
+        '--framing', args.framing,
+        '--delay', '0',
+        '--quiet',
+    ]
+    proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL)
+    deadline = time.time() + 10
+    while time.time() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', args.port)).close()
+            return proc
+        except OSError:
+            time.sleep(0.05)
+    proc.kill()
+    raise RuntimeError('server did not start')
+
+
+async def client(port, names, framed, latencies, stats):
+    try:
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    except OSError:
+        stats['connect_errors'] += 1
+        return
+
+    async def recv():
+        if framed:
+            return await framing.read_frame(reader)
+        return await reader.read(1024)
+
+    def send(data):
+        if framed:
+            framing.write_frame(writer, data)
+        else:
+            writer.write(data)
+
+    try:
+        welcome = await recv()
+        if welcome != b'Welcome!':
+            stats['rejected'] += 1
+            return
+        for name in names:
+            t0 = time.perf_counter()
+            send(name)
+            reply = await recv()
+            latencies.append(time.perf_counter() - t0)
+            if reply != b'Hello, %s!' % name:
+                stats['bad_replies'] += 1
+        send(b'exit')
+        stats['sessions'] += 1
+    except (OSError, asyncio.IncompleteReadError):
+        stats['errors'] += 1
+    finally:
+        writer.close()
+
+
+async def run_clients(args):
+    latencies = []
+    stats = dict(sessions=0, rejected=0, errors=0, connect_errors=0, bad_replies=0)
+    names = [b'Client%d' % i for i in range(args.messages)]
+    start = time.perf_counter()
+    await asyncio.gather(
+        *[client(args.port, names, args.framing == 'length', latencies, stats)
+          for _ in range(args.clients)]
+    )
+    return time.perf_counter() - start, latencies, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='tcp_server benchmark')
+    parser.add_argument('--mode', choices=('async', 'thread'), default='async')
+    parser.add_argument('--framing', choices=('raw', 'length'), default='raw')
+    parser.add_argument('--clients', type=int, default=1000)
+    parser.add_argument('--messages', type=int, default=10)
+    parser.add_argument('--backlog', type=int, default=1024)
+    parser.add_argument('--max-connections', type=int, default=10000)
+    parser.add_argument('--port', type=int, default=9999)
+    args = parser.parse_args()
+
+    proc = start_server(args)
+    try:
+        elapsed, latencies, stats = asyncio.run(run_clients(args))
+    finally:
+        proc.terminate()
+        proc.wait()
+    latencies.sort()
+    print(
+        '%s/%s clients=%d: %.2fs  %.0f sessions/s  %.0f msg/s  rtt p50=%.2fms p99=%.2fms  %s'
+        % (
+            args.mode,
+            args.framing,
+            args.clients,
+            elapsed,
+            stats['sessions'] / elapsed,
+            len(latencies) / elapsed,
+            percentile(latencies, 50) * 1000,
+            percentile(latencies, 99) * 1000,
+            stats,
+        )
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,285 @@
+import asyncio
+from functools import partial, wraps
+from operator import length_hint
+
+# 基于预激协程的推送式流处理，把python_coroutine2.py里的两个做法推广成框架：
+# 1、coroutine 装饰器（即 coroutinue）：创建后自动next预激，可以直接send
+# 2、像 exc_handling 一样，stage在异常后继续运行：处理函数抛出的异常、以及throw()进来的异常，
+#    都交给errors协程（收到 (stage名, 事件, 异常)），不会终止流水线；下游target.send出错时同样交给errors
+# 3、每次send的是一批事件（list），一批数据只恢复每个stage一次
+# 4、close()从头部向下游传递，window等有缓存的stage在关闭时输出剩余数据
+#
+# 用法：
+#   out = []
+#   head = compose(map_(lambda x: x * 2), filter_(lambda x: x % 3), window(10), target=collector(out))
+#   head.send([1, 2, 3, 4])
+#   head.close()
+
+
+def coroutine(func):
+    """
+    装饰器： 向前执行到第一个`yield`表达式，预激`func`
+    """
+
+    @wraps(func)
+    def primer(*args, **kwargs):
+        gen = func(*args, **kwargs)
+        next(gen)
+        return gen
+
+    return primer
+
+
+def _route(errors, name, event, exc):
+    if errors is not None:
+        errors.send([(name, event, exc)])
+
+
+def _send(target, batch, errors, name):
+    # 下游出错（例如queue_sink遇到QueueFull）只交给errors，本stage继续运行
+    try:
+        target.send(batch)
+    except Exception as e:
+        _route(errors, name, batch, e)
+
+
+def _apply(step, batch, errors, name):
+    # step(it) 返回 map/filter 迭代器，由list.extend在C中整批消费（快速路径）。
+    # 某个事件出错时，已加入out的结果保留；由列表迭代器剩余长度算出出错事件的位置，
+    # 交给errors后从下一个事件继续：每个事件只处理一次，只丢弃出错的事件
+    if not isinstance(batch, (list, tuple)):
+        try:
+            batch = list(batch)
+        except Exception as e:
+            # 不是可迭代的一批事件（例如send(5)）：整批交给errors
+            _route(errors, name, batch, e)
+            return []
+    out = []
+    it = iter(batch)
+    while True:
+        try:
+            out.extend(step(it))
+            return out
+        except Exception as e:
+            _route(errors, name, batch[len(batch) - length_hint(it) - 1], e)
+
+
+# ---- stage 工厂：返回 stage(target, errors)，由compose连接 ----
+
+
+def map_(fn, name='map'):
+    step = partial(map, fn)
+
+    @coroutine
+    def stage(target, errors=None):
+        try:
+            while True:
+                try:
+                    batch = yield
+                except Exception as e:
+                    _route(errors, name, None, e)
+                    continue
+                out = _apply(step, batch, errors, name)
+                if out:
+                    _send(target, out, errors, name)
+        finally:
+            target.close()
+
+    return stage
+
+
+def filter_(pred, name='filter'):
+    step = partial(filter, pred)
+
+    @coroutine
+    def stage(target, errors=None):
+        try:
+            while True:
+                try:
+                    batch = yield
+                except Exception as e:
+                    _route(errors, name, None, e)
+                    continue
+                out = _apply(step, batch, errors, name)
+                if out:
+                    _send(target, out, errors, name)
+        finally:
+            target.close()
+
+    return stage
+
+
+def window(size, emit_partial=True, name='window'):
+    """
+    按个数切分的滚动窗口：每size个事件输出一个list作为一个事件
+    """
+
+    @coroutine
+    def stage(target, errors=None):
+        buf = []
+        try:
+            while True:
+                try:
+                    batch = yield
+                except Exception as e:
+                    _route(errors, name, None, e)
+                    continue
+                try:
+                    buf.extend(batch)
+                except Exception as e:
+                    _route(errors, name, batch, e)
+                    continue
+                if len(buf) >= size:
+                    n = len(buf) - len(buf) % size
+                    _send(target, [buf[i : i + size] for i in range(0, n, size)], errors, name)
+                    del buf[:n]
+        finally:
+            if buf and emit_partial:
+                _send(target, [buf], errors, name)
+            target.close()
+
+    return stage
+
+
+def fan_out(*branches, name='fan_out'):
+    """
+    branches：每个分支是一个stage列表，最后一项是该分支的target（已预激的协程）
+    同一批事件发给所有分支；某个分支出错不影响其他分支
+    """
+
+    @coroutine
+    def stage(target, errors=None):
+        heads = [compose(*branch[:-1], target=branch[-1], errors=errors) for branch in branches]
+        if target is not None:
+            heads.append(target)
+        try:
+            while True:
+                try:
+                    batch = yield
+                except Exception as e:
+                    _route(errors, name, None, e)
+                    continue
+                for head in heads:
+                    try:
+                        head.send(batch)
+                    except StopIteration:
+                        pass
+                    except Exception as e:
+                        _route(errors, name, batch, e)
+        finally:
+            for head in heads:
+                head.close()
+
+    return stage
+
+
+def compose(*stages, target, errors=None):
+    """
+    从后往前连接各stage，返回头部协程
+    """
+    head = target
+    for stage in reversed(stages):
+        head = stage(head, errors)
+    return head
+
+
+# ---- target ----
+
+
+@coroutine
+def collector(out):
+    # 把收到的事件追加到out
+    while True:
+        try:
+            batch = yield
+        except Exception:
+            continue
+        out.extend(batch)
+
+
+@coroutine
+def counter(result):
+    # 只计数：result['count']
+    result.setdefault('count', 0)
+    while True:
+        batch = yield
+        result['count'] += len(batch)
+
+
+@coroutine
+def queue_sink(queue, errors=None):
+    # 输出到asyncio.Queue（put_nowait不等待）；队列满等错误交给errors，丢弃该事件后继续
+    while True:
+        try:
+            batch = yield
+        except Exception as e:
+            _route(errors, 'queue_sink', None, e)
+            continue
+        for x in batch:
+            try:
+                queue.put_nowait(x)
+            except Exception as e:
+                _route(errors, 'queue_sink', x, e)
+
+
+# ---- asyncio 适配 ----
+
+
+async def drive_from_queue(queue, head, batch_size=256, sentinel=None):
+    """
+    从asyncio.Queue取事件推入流水线：等到第一个事件后，把队列里已有的事件（最多batch_size个）一起send；
+    取到sentinel时关闭流水线并返回处理的事件数
+    """
+    total = 0
+    while True:
+        item = await queue.get()
+        batch = []
+        done = False
+        while True:
+            if item is sentinel:
+                done = True
+                break
+            batch.append(item)
+            if len(batch) >= batch_size or queue.empty():
+                break
+            item = queue.get_nowait()
+        if batch:
+            head.send(batch)
+            total += len(batch)
+        if done:
+            head.close()
+            return total
+
+
+def send_each(head, events):
+    # 逐个事件send（batch大小为1），用于对比
+    for x in events:
+        head.send([x])
+
+
+if __name__ == '__main__':
+    out, errs = [], []
+    head = compose(
+        map_(lambda x: 10 // x),
+        filter_(lambda x: x % 2 == 0),
+        window(3),
+        target=collector(out),
+        errors=collector(errs),
+    )
+    head.send([1, 2, 0, 3, 4, 5])
+    head.throw(ValueError('ignored'))
+    head.send([6, 7])
+    head.close()
+    print(out)
+    print(errs)
+
+    async def demo():
+        q = asyncio.Queue()
+        res = asyncio.Queue()
+        task = asyncio.ensure_future(drive_from_queue(q, compose(map_(str.upper), target=queue_sink(res))))
+        for name in ['Michael', 'Tracy', 'Sarah', None]:
+            q.put_nowait(name)
+        await task
+        print([res.get_nowait() for _ in range(res.qsize())])
+
+    asyncio.run(demo())
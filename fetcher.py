@@ -0,0 +1,365 @@
+import asyncio
+import ssl
+from urllib.parse import urlsplit
+
+# 异步HTTP/1.1抓取器：
+# 1、每个host维护keep-alive连接池，限制总并发和单host并发
+# 2、asyncio.BufferedProtocol 让传输层直接recv_into预分配的bytearray，不再逐块生成bytes再拼接
+# 3、增量解析响应头，body（Content-Length / chunked / 读到关闭）按块直接交给sink，边收边写盘
+# 4、连接超时和读超时（超过read_timeout秒没有收到数据），卡住的服务器不会一直占着并发名额
+
+_HEAD, _BODY_LENGTH, _BODY_CLOSE, _CHUNK_SIZE, _CHUNK_DATA, _CHUNK_CRLF, _TRAILER, _DONE = range(8)
+
+
+class Response(object):
+    def __init__(self, url, status, reason, headers, raw_header):
+        self.url = url
+        self.status = status
+        self.reason = reason
+        self.headers = headers  # 头部名统一小写
+        self.raw_header = raw_header
+        self.body_size = 0
+
+    def __repr__(self):
+        return "<Response %s %s (%d bytes)>" % (self.status, self.url, self.body_size)
+
+
+def _parse_header(raw):
+    lines = raw.decode("latin-1").split("\r\n")
+    version, status, reason = (lines[0].split(" ", 2) + [""])[:3]
+    headers = {}
+    for line in lines[1:]:
+        k, _, v = line.partition(":")
+        headers[k.strip().lower()] = v.strip()
+    return version, int(status), reason, headers
+
+
+class _HTTPProtocol(asyncio.BufferedProtocol):
+    def __init__(self, bufsize, read_timeout=None):
+        self._buf = bytearray(bufsize)
+        self._view = memoryview(self._buf)
+        self._start = 0
+        self._end = 0
+        self._transport = None
+        self._state = _DONE
+        self._waiter = None
+        self._sink = None
+        self._on_response = None
+        self._url = None
+        self._remaining = 0
+        self.response = None
+        self.keep_alive = False
+        self.closed = False
+        self.bytes_received = 0
+        self._read_timeout = read_timeout
+        self._last_read = 0.0
+        self._timer = None
+        self._loop = None
+
+    def connection_made(self, transport):
+        self._transport = transport
+
+    def get_buffer(self, sizehint):
+        if self._end == len(self._buf):
+            # 缓冲区满：把未处理的部分（半行响应头/chunk长度）挪到开头
+            if self._start == 0:
+                raise ValueError("response header too large")
+            n = self._end - self._start
+            self._buf[:n] = self._buf[self._start : self._end]
+            self._start, self._end = 0, n
+        return self._view[self._end :]
+
+    def buffer_updated(self, nbytes):
+        if self._timer is not None:
+            self._last_read = self._loop.time()
+        self._end += nbytes
+        self.bytes_received += nbytes
+        try:
+            self._process()
+        except Exception as e:
+            self._finish(e)
+            self._transport.close()
+
+    def eof_received(self):
+        return False
+
+    def connection_lost(self, exc):
+        self.closed = True
+        if self._state == _BODY_CLOSE:
+            self.keep_alive = False
+            self._finish()
+        elif self._state != _DONE:
+            self._finish(exc or ConnectionError("connection closed by peer"))
+
+    def request(self, url, data, sink, on_response=None):
+        self._url = url
+        self._sink = sink
+        self._on_response = on_response
+        self._state = _HEAD
+        self._start = self._end = 0
+        self.bytes_received = 0
+        self._loop = asyncio.get_running_loop()
+        self._waiter = self._loop.create_future()
+        if self._read_timeout:
+            # 每个请求只挂一个定时器，到期时若期间收到过数据则顺延
+            self._last_read = self._loop.time()
+            self._timer = self._loop.call_later(self._read_timeout, self._check_timeout)
+        self._transport.write(data)
+        return self._waiter
+
+    def _check_timeout(self):
+        remaining = self._last_read + self._read_timeout - self._loop.time()
+        if remaining > 0:
+            self._timer = self._loop.call_later(remaining, self._check_timeout)
+        else:
+            self._timer = None
+            self._finish(asyncio.TimeoutError("no data received for %ss" % self._read_timeout))
+            self._transport.close()
+
+    def close(self):
+        if self._transport is not None:
+            self._transport.close()
+
+    def _finish(self, exc=None):
+        self._state = _DONE
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        waiter, self._waiter = self._waiter, None
+        if waiter is not None and not waiter.done():
+            if exc is not None:
+                waiter.set_exception(exc)
+            else:
+                waiter.set_result(self.response)
+
+    def _emit(self, n):
+        if n:
+            self._sink(self._view[self._start : self._start + n])
+            self.response.body_size += n
+            self._start += n
+
+    def _process(self):
+        buf = self._buf
+        while self._start < self._end or self._state == _DONE:
+            state = self._state
+            if state == _HEAD:
+                idx = buf.find(b"\r\n\r\n", self._start, self._end)
+                if idx < 0:
+                    break
+                raw = bytes(self._view[self._start : idx])
+                self._start = idx + 4
+                version, status, reason, headers = _parse_header(raw)
+                self.response = Response(self._url, status, reason, headers, raw)
+                if self._on_response is not None:
+                    self._on_response(self.response)
+                conn = headers.get("connection", "").lower()
+                self.keep_alive = (
+                    conn != "close" if version == "HTTP/1.1" else conn == "keep-alive"
+                )
+                if status in (204, 304) or 100 <= status < 200:
+                    self._finish()
+                elif headers.get("transfer-encoding", "").lower() == "chunked":
+                    self._state = _CHUNK_SIZE
+                elif "content-length" in headers:
+                    self._remaining = int(headers["content-length"])
+                    self._state = _BODY_LENGTH
+                    if self._remaining == 0:
+                        self._finish()
+                else:
+                    self._state = _BODY_CLOSE
+            elif state == _BODY_LENGTH or state == _CHUNK_DATA:
+                n = min(self._remaining, self._end - self._start)
+                self._emit(n)
+                self._remaining -= n
+                if self._remaining == 0:
+                    if state == _BODY_LENGTH:
+                        self._finish()
+                    else:
+                        self._state = _CHUNK_CRLF
+            elif state == _BODY_CLOSE:
+                self._emit(self._end - self._start)
+            elif state == _CHUNK_SIZE:
+                idx = buf.find(b"\r\n", self._start, self._end)
+                if idx < 0:
+                    break
+                size = int(bytes(self._view[self._start : idx]).split(b";")[0], 16)
+                self._start = idx + 2
+                if size == 0:
+                    self._state = _TRAILER
+                else:
+                    self._remaining = size
+                    self._state = _CHUNK_DATA
+            elif state == _CHUNK_CRLF:
+                if self._end - self._start < 2:
+                    break
+                self._start += 2
+                self._state = _CHUNK_SIZE
+            elif state == _TRAILER:
+                idx = buf.find(b"\r\n", self._start, self._end)
+                if idx < 0:
+                    break
+                empty = idx == self._start
+                self._start = idx + 2
+                if empty:
+                    self._finish()
+            else:
+                break
+        if self._start == self._end:
+            self._start = self._end = 0
+
+
+def file_sink(path):
+    """
+    边收边写文件的sink，返回 (sink, close)，抓取结束后调用close()：
+    收到第一块数据时才打开文件，排队中的任务不占用文件句柄；
+    无缓冲写入，memoryview直接交给write，不再拷贝到文件缓冲区（FileIO.write可能只写入一部分，循环到写完）；
+    成功但没有body时close()创建空文件，失败时用close(complete=False)只关闭已打开的文件
+    """
+    f = None
+
+    def sink(data):
+        nonlocal f
+        if f is None:
+            f = open(path, "wb", buffering=0)
+        n = f.write(data)
+        if n < len(data):
+            view = memoryview(data)
+            while n < len(view):
+                n += f.write(view[n:])
+
+    def close(complete=True):
+        if f is not None:
+            f.close()
+        elif complete:
+            open(path, "wb").close()
+
+    return sink, close
+
+
+class Fetcher(object):
+    """
+    limit: 所有URL的最大并发数；limit_per_host: 单host最大连接数；bufsize: 每个连接的接收缓冲区大小；
+    connect_timeout: 建立连接（含TLS握手）的超时秒数；read_timeout: 超过该秒数没有收到数据即失败；None表示不限
+    """
+
+    def __init__(
+        self,
+        limit=20,
+        limit_per_host=4,
+        bufsize=256 * 1024,
+        ssl_context=None,
+        connect_timeout=10,
+        read_timeout=30,
+    ):
+        self._limit = asyncio.Semaphore(limit)
+        self._limit_per_host = limit_per_host
+        self._bufsize = bufsize
+        self._ssl = ssl_context
+        self._connect_timeout = connect_timeout
+        self._read_timeout = read_timeout
+        self._host_limits = {}
+        self._idle = {}  # (scheme, host, port) ==> [空闲连接]
+
+    async def _connect(self, key):
+        scheme, host, port = key
+        loop = asyncio.get_running_loop()
+        sslcontext = None
+        if scheme == "https":
+            # 加载系统证书较慢，只在第一次访问https时创建
+            if self._ssl is None:
+                self._ssl = ssl.create_default_context()
+            sslcontext = self._ssl
+        _, proto = await asyncio.wait_for(
+            loop.create_connection(
+                lambda: _HTTPProtocol(self._bufsize, self._read_timeout),
+                host,
+                port,
+                ssl=sslcontext,
+            ),
+            self._connect_timeout,
+        )
+        return proto
+
+    def _pop_idle(self, key):
+        idle = self._idle.get(key)
+        while idle:
+            proto = idle.pop()
+            if not proto.closed:
+                return proto
+        return None
+
+    async def fetch(self, url, sink, on_response=None):
+        """
+        GET url，body按块（memoryview，仅在回调期间有效）交给sink，返回Response；
+        on_response(response) 在响应头解析完、body到达之前调用
+        """
+        parts = urlsplit(url)
+        scheme = parts.scheme or "http"
+        port = parts.port or (443 if scheme == "https" else 80)
+        key = (scheme, parts.hostname, port)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        data = (
+            "GET %s HTTP/1.1\r\nHost: %s\r\nUser-Agent: fetcher\r\n"
+            "Accept-Encoding: identity\r\nConnection: keep-alive\r\n\r\n"
+            % (path, parts.netloc)
+        ).encode("latin-1")
+
+        host_limit = self._host_limits.get(key)
+        if host_limit is None:
+            host_limit = self._host_limits[key] = asyncio.Semaphore(self._limit_per_host)
+        # 先取host名额再取全局名额：排队等同一host的任务不占全局名额，其他host的请求不被它们挡住
+        async with host_limit, self._limit:
+            while True:
+                proto = self._pop_idle(key)
+                reused = proto is not None
+                if proto is None:
+                    proto = await self._connect(key)
+                try:
+                    response = await proto.request(url, data, sink, on_response)
+                except (ConnectionError, OSError):
+                    proto.close()
+                    # 复用的keep-alive连接可能已被服务端关闭，未收到数据时换新连接重试
+                    if reused and proto.bytes_received == 0:
+                        continue
+                    raise
+                except BaseException:
+                    proto.close()
+                    raise
+                if proto.keep_alive and not proto.closed:
+                    self._idle.setdefault(key, []).append(proto)
+                else:
+                    proto.close()
+                return response
+
+    async def fetch_to_file(self, url, path):
+        sink, close = file_sink(path)
+        try:
+            response = await self.fetch(url, sink)
+        except BaseException:
+            close(complete=False)
+            raise
+        close()
+        return response
+
+    async def fetch_many(self, jobs):
+        """
+        jobs: [(url, path), ...]，并发数受limit/limit_per_host限制；失败的任务返回异常对象
+        """
+        return await asyncio.gather(
+            *[self.fetch_to_file(url, path) for url, path in jobs],
+            return_exceptions=True
+        )
+
+    def close(self):
+        for idle in self._idle.values():
+            for proto in idle:
+                proto.close()
+        self._idle.clear()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.close()
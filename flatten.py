@@ -0,0 +1,81 @@
+from collections.abc import Iterable
+from itertools import islice
+
+# 非递归的flatten，python_coroutine3.py 里递归版本的替代：
+# 1、用显式栈保存各层迭代器，嵌套再深也不会触发RecursionError，也不用每层一个生成器帧
+# 2、“是否当作容器展开”按类型缓存，同一类型只做一次Iterable（ABC）判断
+# 3、list/tuple走快速路径，不查缓存
+# 4、flatten_chunks 按块输出，减少调用方逐个next的开销
+#
+# 注意：自己包含自己的容器会无限展开（递归版本则是RecursionError）。
+# 例外是str：单个字符迭代出的还是它自己，ignore_types中没有str时，单字符串当作叶子元素产出。
+
+# ignore_types ==> {类型: _LEAF / _CONTAINER / _STRING}
+_CONTAINER_CACHE = {}
+_LEAF, _CONTAINER, _STRING = 0, 1, 2
+
+
+def _classify(t, ignore_types):
+    if not issubclass(t, Iterable) or issubclass(t, ignore_types):
+        return _LEAF
+    return _STRING if issubclass(t, str) else _CONTAINER
+
+
+def _container_cache(ignore_types):
+    cache = _CONTAINER_CACHE.get(ignore_types)
+    if cache is None:
+        cache = _CONTAINER_CACHE[ignore_types] = {}
+    return cache
+
+
+def flatten(items, ignore_types=(str, bytes)):
+    """
+    逐个产出items中嵌套的非容器元素；ignore_types中的类型（默认str/bytes）不展开
+    """
+    ignore_types = tuple(ignore_types)
+    cache = _container_cache(ignore_types)
+    fast = not issubclass(list, ignore_types) and not issubclass(tuple, ignore_types)
+    stack = [iter(items)]
+    push = stack.append
+    pop = stack.pop
+    while stack:
+        for x in stack[-1]:
+            t = type(x)
+            if fast and (t is list or t is tuple):
+                push(iter(x))
+                break
+            kind = cache.get(t)
+            if kind is None:
+                kind = cache[t] = _classify(t, ignore_types)
+            if kind == _CONTAINER or (kind == _STRING and len(x) != 1):
+                push(iter(x))
+                break
+            yield x
+        else:
+            # 当前层已经遍历完，回到上一层继续
+            pop()
+
+
+def flatten_chunks(items, chunk_size=1024, ignore_types=(str, bytes)):
+    """
+    与flatten相同，但每次产出一个最多chunk_size个元素的list
+    """
+    it = flatten(items, ignore_types)
+    while True:
+        chunk = list(islice(it, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+if __name__ == '__main__':
+    items = [1, 2, [3, 4, [5, 6], 7], 8]
+    # Produces 1 2 3 4 5 6 7 8
+    print(list(flatten(items)))
+    print(list(flatten(['Dave', 'Paula', ['Thomas', 'Lewis']])))
+    # 不忽略str时展开到单个字符为止：['a', 'b', 'c', 'd']
+    print(list(flatten(['ab', ['cd']], ignore_types=())))
+    deep = [0]
+    for i in range(1, 100000):
+        deep = [deep, i]
+    print(sum(flatten(deep)))
@@ -0,0 +1,58 @@
+import struct
+
+# 长度前缀分帧：每条消息 = 4字节大端长度 + 内容。
+# 消息边界不再依赖一次recv(1024)收到多少字节：多条消息可在一次recv中到达，一条消息也可分多次到达。
+
+HEADER = struct.Struct("!I")
+MAX_FRAME = 1 << 20
+
+
+class FrameTooLarge(ValueError):
+    pass
+
+
+def encode(payload):
+    return HEADER.pack(len(payload)) + payload
+
+
+def encode_many(payloads):
+    return b"".join([HEADER.pack(len(p)) + p for p in payloads])
+
+
+class FrameDecoder(object):
+    """
+    增量解码器：feed(收到的字节)，返回其中完整的消息列表，不完整的部分留到下次
+    """
+
+    def __init__(self, max_frame=MAX_FRAME):
+        self._buf = bytearray()
+        self._max_frame = max_frame
+
+    def feed(self, data):
+        buf = self._buf
+        buf += data
+        frames = []
+        pos = 0
+        size = HEADER.size
+        while len(buf) - pos >= size:
+            (n,) = HEADER.unpack_from(buf, pos)
+            if n > self._max_frame:
+                raise FrameTooLarge("frame of %d bytes exceeds %d" % (n, self._max_frame))
+            if len(buf) - pos - size < n:
+                break
+            frames.append(bytes(buf[pos + size : pos + size + n]))
+            pos += size + n
+        if pos:
+            del buf[:pos]
+        return frames
+
+
+async def read_frame(reader, max_frame=MAX_FRAME):
+    (n,) = HEADER.unpack(await reader.readexactly(HEADER.size))
+    if n > max_frame:
+        raise FrameTooLarge("frame of %d bytes exceeds %d" % (n, max_frame))
+    return await reader.readexactly(n)
+
+
+def write_frame(writer, payload):
+    writer.write(encode(payload))
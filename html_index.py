@@ -0,0 +1,393 @@
+import codecs
+import mmap
+import re
+import struct
+import sys
+from collections import namedtuple
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+
+from fetcher import file_sink
+
+# 抓取页面的流式抽取与索引：
+# 1、PageExtractor 作为 Fetcher.fetch 的sink，body边到达边增量解码、增量解析（HTMLParser.feed），
+#    抽取标题、链接和正文文本，不再先把整页写盘、再读回来整页解析
+# 2、编码只确定一次：BOM > HTTP头里的charset > 前1024字节中<meta>声明的charset > 默认utf-8；
+#    确定之前只缓存这最多1024字节，之后用增量解码器逐块解码，整个文档只解码一遍
+# 3、IndexWriter 把抽取结果写成紧凑的二进制索引文件，Index 用mmap打开、按URL二分查找，
+#    标题/正文/链接在访问时才从映射中切片解码，查询时不再解析HTML
+#
+# 用法：
+#   async with Fetcher() as fetcher:
+#       response, page = await fetch_page(fetcher, 'https://www.sina.com.cn/', 'sina.html')
+#   with IndexWriter('sina.idx') as w:
+#       w.add(page)
+#   with Index('sina.idx') as index:
+#       print(index['https://www.sina.com.cn/'].title)
+
+Page = namedtuple("Page", "url charset title text links")
+
+_SNIFF_SIZE = 1024
+_META_CHARSET = re.compile(rb"<meta[^>]*?charset\s*=\s*[\"']?\s*([a-zA-Z0-9_.:-]+)", re.I)
+_BOMS = (
+    (codecs.BOM_UTF8, "utf-8"),
+    (codecs.BOM_UTF16_LE, "utf-16-le"),
+    (codecs.BOM_UTF16_BE, "utf-16-be"),
+)
+# 与浏览器一致：按超集解码
+_SUPERSETS = {"gb2312": "gb18030", "gbk": "gb18030", "latin-1": "cp1252", "ascii": "cp1252"}
+_SKIP_TAGS = frozenset(("script", "style", "noscript", "template"))
+_SKIP_LINKS = ("#", "javascript:", "mailto:")
+
+
+def _lookup(name):
+    try:
+        name = codecs.lookup(name).name
+    except (LookupError, TypeError):
+        return None
+    return _SUPERSETS.get(name, name)
+
+
+def charset_from_content_type(value):
+    # 'text/html; charset=utf-8' ==> 'utf-8'
+    if not value:
+        return None
+    for param in value.split(";")[1:]:
+        k, _, v = param.partition("=")
+        if k.strip().lower() == "charset":
+            return v.strip().strip("\"'") or None
+    return None
+
+
+def sniff_charset(head, content_type=None, default="utf-8"):
+    """
+    根据文档开头的字节确定编码，返回 (编码名, BOM长度)
+    """
+    for bom, name in _BOMS:
+        if head.startswith(bom):
+            return name, len(bom)
+    charset = _lookup(charset_from_content_type(content_type))
+    if charset is None:
+        m = _META_CHARSET.search(head, 0, _SNIFF_SIZE)
+        if m is not None:
+            charset = _lookup(m.group(1).decode("ascii"))
+            if charset is not None and charset.startswith("utf-16"):
+                # 能用ASCII读出<meta>的文档不可能是utf-16
+                charset = "utf-8"
+    return charset or default, 0
+
+
+class _PageParser(HTMLParser):
+    def __init__(self, base, max_text):
+        super().__init__(convert_charrefs=True)
+        self.base = base
+        self.title = None
+        self.links = {}  # 按出现顺序去重
+        self._text = []
+        self._text_len = 0
+        self._max_text = max_text
+        self._skip = 0
+        self._title = None
+        self._run = []  # 两个标签之间的文本；分块feed时可能分几次到达
+
+    def _flush(self):
+        if not self._run:
+            return
+        data = "".join(self._run)
+        self._run = []
+        if self._max_text is not None and self._text_len >= self._max_text:
+            return
+        words = data.split()
+        if words:
+            piece = " ".join(words)
+            self._text.append(piece)
+            self._text_len += len(piece) + 1
+
+    def handle_starttag(self, tag, attrs):
+        self._flush()
+        if tag in _SKIP_TAGS:
+            self._skip += 1
+        elif tag == "a" or tag == "area":
+            for k, v in attrs:
+                if k == "href" and v:
+                    v = v.strip()
+                    if v and not v.startswith(_SKIP_LINKS):
+                        self.links[urljoin(self.base, v)] = None
+                    break
+        elif tag == "title":
+            if self.title is None:
+                self._title = []
+        elif tag == "base":
+            for k, v in attrs:
+                if k == "href" and v:
+                    self.base = urljoin(self.base, v.strip())
+
+    def handle_endtag(self, tag):
+        self._flush()
+        if tag in _SKIP_TAGS:
+            if self._skip:
+                self._skip -= 1
+        elif tag == "title" and self._title is not None:
+            self.title = " ".join("".join(self._title).split())
+            self._title = None
+
+    def handle_data(self, data):
+        if self._skip:
+            return
+        if self._title is not None:
+            self._title.append(data)
+        else:
+            self._run.append(data)
+
+    def close(self):
+        super().close()
+        self._flush()
+
+    def text(self):
+        text = " ".join(self._text)
+        if self._max_text is not None:
+            text = text[: self._max_text]
+        return text
+
+
+class PageExtractor(object):
+    """
+    url: 页面地址，用于解析相对链接；content_type: HTTP头的Content-Type，None时从文档中探测编码；
+    max_text: 正文最多保留的字符数，None表示不限
+    作为sink逐块调用 extractor(chunk)，全部数据到达后 close() 返回Page
+    """
+
+    def __init__(self, url="", content_type=None, default_encoding="utf-8", max_text=None):
+        self.url = url
+        self.content_type = content_type
+        self.default_encoding = default_encoding
+        self.charset = None
+        self._head = bytearray()
+        self._decoder = None
+        self._parser = _PageParser(url, max_text)
+
+    def on_response(self, response):
+        # 作为Fetcher.fetch的on_response：body到达之前拿到Content-Type
+        self.content_type = response.headers.get("content-type")
+
+    def _start(self):
+        head = self._head
+        self._head = None
+        self.charset, skip = sniff_charset(head, self.content_type, self.default_encoding)
+        self._decoder = codecs.getincrementaldecoder(self.charset)(errors="replace")
+        return memoryview(head)[skip:]
+
+    def __call__(self, data):
+        if self._decoder is None:
+            # 编码确定之前，只缓存开头的最多_SNIFF_SIZE字节（data仅在回调期间有效，需要拷贝）
+            self._head += data
+            if len(self._head) < _SNIFF_SIZE:
+                return
+            data = self._start()
+        self._parser.feed(self._decoder.decode(data))
+
+    def close(self):
+        data = self._start() if self._decoder is None else b""
+        text = self._decoder.decode(data, final=True)
+        if text:
+            self._parser.feed(text)
+        parser = self._parser
+        parser.close()
+        return Page(self.url, self.charset, parser.title or "", parser.text(), list(parser.links))
+
+
+def extract_file(path, url="", content_type=None, chunk_size=64 * 1024, **kw):
+    """
+    按块读取已保存的页面并抽取，内存占用与页面大小无关
+    """
+    extractor = PageExtractor(url, content_type, **kw)
+    buf = bytearray(chunk_size)
+    view = memoryview(buf)
+    with open(path, "rb", buffering=0) as f:
+        while True:
+            n = f.readinto(buf)
+            if not n:
+                break
+            extractor(view[:n])
+    return extractor.close()
+
+
+async def fetch_page(fetcher, url, path=None, **kw):
+    """
+    用fetcher抓取url，边接收边抽取，path不为None时同时写入文件；返回 (Response, Page)
+    """
+    extractor = PageExtractor(url, **kw)
+    if path is None:
+        sink, close = extractor, None
+    else:
+        write, close = file_sink(path)
+
+        def sink(data):
+            write(data)
+            extractor(data)
+
+    try:
+        response = await fetcher.fetch(url, sink, on_response=extractor.on_response)
+    except BaseException:
+        if close is not None:
+            close(complete=False)
+        raise
+    if close is not None:
+        close()
+    return response, extractor.close()
+
+
+# 索引文件格式（小端）：
+#   头部    magic(8) | 页面数 u32 | 记录表偏移 u64
+#   数据区  每个页面的url、charset、title、text、links（'\n'分隔）依次以utf-8写入
+#   记录表  按url的utf-8字节排序的定长记录，每个字段一对 (偏移 u64, 长度 u32)
+_MAGIC = b"HTMLIDX1"
+_HEADER = struct.Struct("<8sIQ")
+_FIELDS = Page._fields
+_RECORD = struct.Struct("<" + "QI" * len(_FIELDS))
+
+
+class IndexWriter(object):
+    """
+    数据区边add边写入文件，内存中只保留定长记录；close()时写记录表并回填头部
+    """
+
+    def __init__(self, path):
+        self._f = open(path, "wb")
+        self._f.write(_HEADER.pack(_MAGIC, 0, 0))
+        self._offset = _HEADER.size
+        self._records = []
+
+    def add(self, page):
+        record = []
+        for name in _FIELDS:
+            value = getattr(page, name)
+            if name == "links":
+                value = "\n".join(value)
+            data = (value or "").encode("utf-8")
+            self._f.write(data)
+            record += (self._offset, len(data))
+            self._offset += len(data)
+        self._records.append((page.url.encode("utf-8"), record))
+
+    def close(self):
+        if self._f is None:
+            return
+        self._records.sort(key=lambda r: r[0])
+        f = self._f
+        f.write(b"".join(_RECORD.pack(*record) for _, record in self._records))
+        f.seek(0)
+        f.write(_HEADER.pack(_MAGIC, len(self._records), self._offset))
+        f.close()
+        self._f = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class IndexedPage(object):
+    """
+    索引中的一个页面：字段在访问时才从mmap中切片解码
+    """
+
+    __slots__ = ("_mm", "_fields")
+
+    def __init__(self, mm, fields):
+        self._mm = mm
+        self._fields = fields
+
+    def _get(self, i):
+        off, size = self._fields[2 * i], self._fields[2 * i + 1]
+        return self._mm[off : off + size].decode("utf-8")
+
+    url = property(lambda self: self._get(0))
+    charset = property(lambda self: self._get(1))
+    title = property(lambda self: self._get(2))
+    text = property(lambda self: self._get(3))
+
+    @property
+    def links(self):
+        links = self._get(4)
+        return links.split("\n") if links else []
+
+    def page(self):
+        return Page(self.url, self.charset, self.title, self.text, self.links)
+
+    def __repr__(self):
+        return "<IndexedPage %s>" % self.url
+
+
+class Index(object):
+    """
+    用mmap只读打开IndexWriter写出的索引文件；index[url] / index.get(url) / url in index
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self._count, self._table = _HEADER.unpack_from(self._mm, 0)
+        if magic != _MAGIC:
+            self._mm.close()
+            raise ValueError("not an html index: %s" % path)
+
+    def __len__(self):
+        return self._count
+
+    def _record(self, i):
+        return _RECORD.unpack_from(self._mm, self._table + i * _RECORD.size)
+
+    def _url(self, i):
+        off, size = _RECORD.unpack_from(self._mm, self._table + i * _RECORD.size)[:2]
+        return self._mm[off : off + size]
+
+    def get(self, url, default=None):
+        key = url.encode("utf-8")
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._url(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self._count and self._url(lo) == key:
+            return IndexedPage(self._mm, self._record(lo))
+        return default
+
+    def __getitem__(self, url):
+        page = self.get(url)
+        if page is None:
+            raise KeyError(url)
+        return page
+
+    def __contains__(self, url):
+        return self.get(url) is not None
+
+    def __iter__(self):
+        # 按url排序遍历全部页面
+        for i in range(self._count):
+            yield IndexedPage(self._mm, self._record(i))
+
+    def close(self):
+        self._mm.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+if __name__ == "__main__":
+    # python3 html_index.py sina.idx sina.html [更多页面...]：抽取已保存的页面并写入索引
+    out, paths = sys.argv[1], sys.argv[2:]
+    with IndexWriter(out) as writer:
+        for path in paths:
+            page = extract_file(path, url=path)
+            writer.add(page)
+            print("%s [%s] %r: %d links, %d chars" % (path, page.charset, page.title, len(page.links), len(page.text)))
+    with Index(out) as index:
+        for page in index:
+            print(page, page.title)
@@ -0,0 +1,237 @@
+import multiprocessing
+import queue
+import traceback
+from multiprocessing import resource_tracker, shared_memory
+
+# 多进程生产者/消费者流水线，是asynico1.py里 写进程 -> Queue -> 读进程 的推广：
+# 1、Source由N个生产者进程产生数据，每个Stage由M个工作进程处理，上一级的输出队列就是下一级的输入队列
+# 2、队列中传递的是一批数据（list），一次pickle/一次管道读写摊到batch_size条数据上
+# 3、超过shm_threshold的bytes类数据放入共享内存，队列里只传一个很小的SharedBuffer句柄
+# 4、队列有界（queue_size批），下游慢时上游put阻塞，形成背压
+# 5、用哨兵正常结束，不再需要terminate()：
+#    每个进程在自己的最后一批数据之后放入一个_STOP（同一进程put的数据按顺序到达，_STOP一定在其数据之后）；
+#    下一级共用一个计数器，收齐上一级全部_STOP的那个进程再放入_EXIT通知同级的其他进程退出
+# 6、工作进程被SIGKILL/OOM杀掉或崩溃时来不及报告错误：父进程定时检查各进程的exitcode，非0即报错
+#
+# 用法：
+#   def numbers(index, workers):
+#       return range(index, 1000, workers)
+#   def square(x):
+#       return x * x
+#   for y in Pipeline(Source(numbers, workers=2), [Stage(square, workers=4)]).run():
+#       print(y)
+
+_STOP = '__pipeline_stop__'
+_EXIT = '__pipeline_exit__'
+_POLL_INTERVAL = 0.5  # 秒：结果队列空闲这么久就检查一次工作进程是否还活着
+
+
+class Source(object):
+    """
+    fn(index, workers) 返回一个可迭代对象，index为该生产者的序号
+    """
+
+    def __init__(self, fn, workers=1):
+        self.fn = fn
+        self.workers = workers
+
+
+class Stage(object):
+    """
+    fn(item) 返回处理后的数据；返回None时丢弃该条数据
+    """
+
+    def __init__(self, fn, workers=1):
+        self.fn = fn
+        self.workers = workers
+
+
+class SharedBuffer(object):
+    """
+    放在共享内存中的大块数据的句柄，可以被pickle；接收方调用take()取出数据并释放共享内存
+    """
+
+    __slots__ = ('name', 'size')
+
+    def __init__(self, name, size):
+        self.name = name
+        self.size = size
+
+    @classmethod
+    def put(cls, data):
+        shm = shared_memory.SharedMemory(create=True, size=max(1, len(data)))
+        shm.buf[: len(data)] = data
+        handle = cls(shm.name, len(data))
+        shm.close()
+        return handle
+
+    def take(self):
+        shm = shared_memory.SharedMemory(name=self.name)
+        try:
+            return bytes(shm.buf[: self.size])
+        finally:
+            shm.close()
+            shm.unlink()
+
+
+class PipelineError(RuntimeError):
+    pass
+
+
+class _Failure(object):
+    def __init__(self, where, tb):
+        self.where = where
+        self.tb = tb
+
+
+def _wrap(item, shm_threshold):
+    if (
+        shm_threshold is not None
+        and isinstance(item, (bytes, bytearray, memoryview))
+        and len(item) >= shm_threshold
+    ):
+        return SharedBuffer.put(item)
+    return item
+
+
+def _unwrap(item):
+    if isinstance(item, SharedBuffer):
+        return item.take()
+    return item
+
+
+class _Output(object):
+    # 按批缓存一个进程的输出，满batch_size条put一次
+    def __init__(self, queue, batch_size, shm_threshold):
+        self._queue = queue
+        self._batch_size = batch_size
+        self._shm_threshold = shm_threshold
+        self._batch = []
+
+    def add(self, item):
+        self._batch.append(_wrap(item, self._shm_threshold))
+        if len(self._batch) >= self._batch_size:
+            self.flush()
+
+    def flush(self):
+        if self._batch:
+            self._queue.put(self._batch)
+            self._batch = []
+
+
+def _run_source(source, index, out_queue, results, batch_size, shm_threshold):
+    try:
+        out = _Output(out_queue, batch_size, shm_threshold)
+        for item in source.fn(index, source.workers):
+            out.add(item)
+        out.flush()
+        out_queue.put(_STOP)
+    except BaseException:
+        results.put(_Failure('source[%d]' % index, traceback.format_exc()))
+        raise
+
+
+def _run_stage(stage, name, in_queue, upstream, stops, out_queue, results, batch_size, shm_threshold):
+    try:
+        out = _Output(out_queue, batch_size, shm_threshold)
+        fn = stage.fn
+        while True:
+            batch = in_queue.get()
+            if batch == _EXIT:
+                break
+            if batch == _STOP:
+                with stops.get_lock():
+                    stops.value += 1
+                    last = stops.value == upstream
+                if last:
+                    # 上一级全部结束，排在_EXIT之前的数据都会被同级进程处理完
+                    for _ in range(stage.workers - 1):
+                        in_queue.put(_EXIT)
+                    break
+                continue
+            for item in batch:
+                r = fn(_unwrap(item))
+                if r is not None:
+                    out.add(r)
+        out.flush()
+        out_queue.put(_STOP)
+    except BaseException:
+        results.put(_Failure(name, traceback.format_exc()))
+        raise
+
+
+def _check_alive(processes):
+    for p in processes:
+        if p.exitcode is not None and p.exitcode != 0:
+            raise PipelineError('%s exited with code %d' % (p.name, p.exitcode))
+
+
+class Pipeline(object):
+    """
+    batch_size: 每次队列传输的数据条数；queue_size: 每个队列最多缓存的批数；
+    shm_threshold: bytes类数据达到该字节数时经共享内存传递，None表示不用共享内存
+    """
+
+    def __init__(self, source, stages, batch_size=64, queue_size=16, shm_threshold=1 << 20, context=None):
+        self.source = source
+        self.stages = list(stages)
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.shm_threshold = shm_threshold
+        self._ctx = context or multiprocessing.get_context()
+
+    def run(self):
+        """
+        启动所有进程，逐条产出最后一级的结果（多个工作进程时不保证顺序）
+        """
+        ctx = self._ctx
+        if self.shm_threshold is not None:
+            # 先在父进程启动resource_tracker，子进程共用它；否则每个子进程各起一个，
+            # 生产者进程退出时它的tracker会把还没被取走的共享内存当作泄漏删除
+            resource_tracker.ensure_running()
+        levels = [self.source] + self.stages
+        # queues[i] 是第i级的输出队列；最后一级输出到results，由当前进程读取
+        queues = [ctx.Queue(self.queue_size) for _ in self.stages]
+        results = ctx.Queue(self.queue_size)
+        queues.append(results)
+        processes = []
+        for i, level in enumerate(levels):
+            # 本级收到的上一级_STOP个数
+            stops = ctx.Value('i', 0)
+            for index in range(level.workers):
+                if i == 0:
+                    target = _run_source
+                    name = 'source[%d]' % index
+                    args = (level, index)
+                else:
+                    target = _run_stage
+                    name = 'stage%d[%d]' % (i, index)
+                    args = (level, name, queues[i - 1], levels[i - 1].workers, stops)
+                args += (queues[i], results, self.batch_size, self.shm_threshold)
+                p = ctx.Process(target=target, args=args, name=name, daemon=True)
+                p.start()
+                processes.append(p)
+
+        pending = levels[-1].workers
+        try:
+            while pending:
+                try:
+                    batch = results.get(timeout=_POLL_INTERVAL)
+                except queue.Empty:
+                    _check_alive(processes)
+                    continue
+                if batch == _STOP:
+                    pending -= 1
+                    continue
+                if isinstance(batch, _Failure):
+                    raise PipelineError('%s failed:\n%s' % (batch.where, batch.tb))
+                for item in batch:
+                    yield _unwrap(item)
+        except BaseException:
+            # 出错或调用方提前停止迭代：只有这时才强制结束工作进程
+            for p in processes:
+                p.terminate()
+            raise
+        finally:
+            for p in processes:
+                p.join()
@@ -1,4 +1,4 @@
-from collections import Iterable
+from collections.abc import Iterable  # collections.Iterable 在Python 3.10中已移除
 
 def flatten(items, ignore_types=(str, bytes)):
     for x in items:
@@ -7,11 +7,13 @@ def flatten(items, ignore_types=(str, bytes)):
         else:
             yield x
 
-items = [1, 2, [3, 4, [5, 6], 7], 8]
+# 非递归、带类型缓存的版本见 flatten.py
+if __name__ == '__main__':
+    items = [1, 2, [3, 4, [5, 6], 7], 8]
 
-# Produces 1 2 3 4 5 6 7 8
-for x in flatten(items):
-    print(x)
+    # Produces 1 2 3 4 5 6 7 8
+    for x in flatten(items):
+        print(x)
 
 # items = ['Dave', 'Paula', ['Thomas', 'Lewis']]
 # for x in flatten(items):
@@ -1,33 +1,25 @@
-# 导入socket库:
-import socket
-import ssl 
+# 导入asyncio和异步抓取器:
+import asyncio
 
-# 创建一个socket:
-# s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-# # 建立连接:
-# s.connect(('www.sina.com.cn', 80))
-s = ssl.wrap_socket(socket.socket())
-s.connect(('www.sina.com.cn', 443))
-# 发送数据:
-s.send(b'GET / HTTP/1.1\r\nHost: www.sina.com.cn\r\nConnection: close\r\n\r\n')
+from fetcher import Fetcher
+from html_index import IndexWriter, fetch_page
 
+# 原来的写法：ssl.wrap_socket + 阻塞recv(1024) 逐块追加到list，最后b''.join后一次性写文件。
+# 现在改用 fetcher.Fetcher：
+# 1、连接由asyncio管理，可同时抓取多个页面，同一host的连接keep-alive复用
+# 2、数据直接接收到预分配的缓冲区，边接收边写入文件，不再把整页保存在内存中
+# 3、同一份数据边接收边交给html_index增量解析，抽取标题/链接/正文写入索引，之后查询不必再解析sina.html
 
-# 接收数据:
-buffer = []
-while True:
-    # 每次最多接收1k字节:
-    d = s.recv(1024)
-    if d:
-        buffer.append(d)
-    else:
-        break
-data = b''.join(buffer)
 
-# 关闭连接:
-s.close()
+async def main():
+    async with Fetcher() as fetcher:
+        # 发送请求、接收数据并写入文件，同时抽取页面内容:
+        response, page = await fetch_page(fetcher, "https://www.sina.com.cn/", "sina.html")
+    print(response.raw_header.decode("utf-8"))
+    with IndexWriter("sina.idx") as writer:
+        writer.add(page)
+    print("%s [%s]: %d links, %d chars of text" % (page.title, page.charset, len(page.links), len(page.text)))
 
-header, html = data.split(b'\r\n\r\n', 1)
-print(header.decode('utf-8'))
-# 把接收的数据写入文件:
-with open('sina.html', 'wb') as f:
-    f.write(html)
\ No newline at end of file
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,182 @@
+import asyncio
+import itertools
+from collections import deque
+
+import framing
+
+# tcp_server.py（--framing length）协议的流水线客户端：
+# 1、一个连接上可以同时有很多未完成的请求，不再一发一收等一个往返
+# 2、服务器按顺序逐条回复，所以每个连接用一个FIFO队列把回复对应到请求
+# 3、ClientPool 维护多个连接，请求分摊到未完成请求最少的连接上
+#
+# 用法：
+#   async with ClientPool('127.0.0.1', 9999, size=4) as pool:
+#       reply = await pool.send(b'Michael')
+#       replies = await pool.send_many([b'Tracy', b'Sarah'])
+#   或同步批量：send_many([b'Michael', b'Tracy'])
+
+
+class PipelinedConnection(object):
+    """
+    max_pending: 单连接上未完成请求数的上限，超出时send等待（背压）
+    """
+
+    def __init__(self, host, port, max_pending=1000):
+        self._host = host
+        self._port = port
+        self._pending = deque()
+        self._slots = asyncio.Semaphore(max_pending)
+        self._reader = None
+        self._writer = None
+        self._read_task = None
+        self.welcome = None
+
+    @property
+    def pending(self):
+        return len(self._pending)
+
+    async def connect(self):
+        self._reader, self._writer = await asyncio.open_connection(self._host, self._port)
+        self.welcome = await framing.read_frame(self._reader)
+        if self.welcome != b'Welcome!':
+            self._writer.close()
+            raise ConnectionError('server refused connection: %r' % self.welcome)
+        self._read_task = asyncio.ensure_future(self._read_loop())
+
+    async def _read_loop(self):
+        try:
+            while True:
+                reply = await framing.read_frame(self._reader)
+                fut = self._pending.popleft()
+                self._slots.release()
+                if not fut.done():
+                    fut.set_result(reply)
+        except (asyncio.IncompleteReadError, ConnectionError, IndexError) as e:
+            self._fail(ConnectionError('connection lost: %r' % e))
+        except asyncio.CancelledError:
+            self._fail(ConnectionError('connection closed'))
+
+    def _fail(self, exc):
+        while self._pending:
+            fut = self._pending.popleft()
+            self._slots.release()
+            if not fut.done():
+                fut.set_exception(exc)
+
+    def _check(self):
+        if self._read_task is None or self._read_task.done():
+            raise ConnectionError('connection is not open')
+
+    async def _acquire(self):
+        # 连接已关闭时不占用名额：先检查，等到名额后再检查一次（等待期间连接可能断开）
+        self._check()
+        await self._slots.acquire()
+        try:
+            self._check()
+        except ConnectionError:
+            self._slots.release()
+            raise
+
+    async def send(self, payload):
+        await self._acquire()
+        fut = asyncio.get_running_loop().create_future()
+        self._pending.append(fut)
+        framing.write_frame(self._writer, payload)
+        await self._writer.drain()
+        return await fut
+
+    async def send_many(self, payloads):
+        """
+        合并成一次write发出（受max_pending限制时分批），再按顺序等待回复
+        """
+        loop = asyncio.get_running_loop()
+        futures = []
+        batch = []
+        for payload in payloads:
+            if batch and self._slots.locked():
+                # 达到max_pending：先把攒下的请求发出去，等回复腾出名额
+                self._writer.write(framing.encode_many(batch))
+                batch = []
+                await self._writer.drain()
+            await self._acquire()
+            fut = loop.create_future()
+            self._pending.append(fut)
+            futures.append(fut)
+            batch.append(payload)
+        if batch:
+            self._writer.write(framing.encode_many(batch))
+            await self._writer.drain()
+        return await asyncio.gather(*futures)
+
+    async def close(self):
+        if self._writer is None:
+            return
+        if self._read_task is not None and not self._read_task.done():
+            # 等已发出的请求都收到回复后再发exit
+            if self._pending:
+                await asyncio.gather(*list(self._pending), return_exceptions=True)
+            framing.write_frame(self._writer, b'exit')
+            self._read_task.cancel()
+        self._writer.close()
+        self._writer = None
+
+
+class ClientPool(object):
+    def __init__(self, host='127.0.0.1', port=9999, size=4, max_pending=1000):
+        self._conns = [PipelinedConnection(host, port, max_pending) for _ in range(size)]
+        self._rr = itertools.cycle(range(size))
+
+    async def connect(self):
+        await asyncio.gather(*[c.connect() for c in self._conns])
+        return self
+
+    def _pick(self):
+        # 优先未完成请求最少的连接，相同时轮询
+        best = self._conns[next(self._rr)]
+        for conn in self._conns:
+            if conn.pending < best.pending:
+                best = conn
+        return best
+
+    async def send(self, payload):
+        return await self._pick().send(payload)
+
+    async def send_many(self, payloads):
+        """
+        按连接数切分成连续的批次，各批次在各自的连接上流水线发送，返回与payloads顺序一致的回复
+        """
+        payloads = list(payloads)
+        n = len(self._conns)
+        step = (len(payloads) + n - 1) // n or 1
+        batches = [payloads[i : i + step] for i in range(0, len(payloads), step)]
+        results = await asyncio.gather(
+            *[conn.send_many(batch) for conn, batch in zip(self._conns, batches)]
+        )
+        return [reply for batch in results for reply in batch]
+
+    async def close(self):
+        await asyncio.gather(*[c.close() for c in self._conns])
+
+    async def __aenter__(self):
+        return await self.connect()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+
+def send_many(payloads, host='127.0.0.1', port=9999, size=4):
+    """
+    同步批量接口：建立连接池，发送全部消息，返回回复列表
+    """
+
+    async def run():
+        async with ClientPool(host, port, size) as pool:
+            return await pool.send_many(payloads)
+
+    return asyncio.run(run())
+
+
+if __name__ == '__main__':
+    # 需先运行：python3 tcp_server.py --framing length
+    for reply in send_many([b'Michael', b'Tracy', b'Sarah']):
+        print(reply.decode('utf-8'))
@@ -1,30 +1,161 @@
+import argparse
+import asyncio
 import socket
 import threading
 import time
 
-s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+import framing
 
-# 监听端口:
-s.bind(('127.0.0.1', 9999))
+# 协议：连接后服务器发送 Welcome!，之后每收到一个名字回复 Hello, 名字!，收到 exit 关闭连接。
+# 两种运行方式：
+# 1、thread：原来的写法，每个连接一个线程（python3 tcp_server.py --mode thread）
+# 2、async：asyncio事件循环处理所有连接，支持最大连接数、空闲超时和长度前缀分帧（--framing length）
 
-s.listen(5)
-print('Waiting for connection...')
 
-def tcplink(sock, addr):
+def tcplink(sock, addr, delay=1):
     print('Accept new connection from %s:%s...' % addr)
     sock.send(b'Welcome!')
     while True:
         data = sock.recv(1024)
-        time.sleep(1)
+        if delay:
+            time.sleep(delay)
         if not data or data.decode('utf-8') == 'exit':
             break
         sock.send(('Hello, %s!' % data.decode('utf-8')).encode('utf-8'))
     sock.close()
     print('Connection from %s:%s closed.' % addr)
 
-while True:
-    # 接受一个新连接:
-    sock, addr = s.accept()
-    # 创建新线程来处理TCP连接:
-    t = threading.Thread(target=tcplink, args=(sock, addr))
-    t.start()
\ No newline at end of file
+
+def serve_threaded(host='127.0.0.1', port=9999, backlog=5, delay=1):
+    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    # 监听端口:
+    s.bind((host, port))
+    s.listen(backlog)
+    print('Waiting for connection...')
+    while True:
+        # 接受一个新连接:
+        sock, addr = s.accept()
+        # 创建新线程来处理TCP连接:
+        t = threading.Thread(target=tcplink, args=(sock, addr, delay))
+        t.start()
+
+
+class EchoServer(object):
+    """
+    max_connections: 同时处理的最大连接数，超出时回复 Busy! 并关闭
+    idle_timeout: 连接空闲超过该秒数即关闭，None表示不限
+    framed: True时消息使用framing的长度前缀分帧，否则沿用一次recv即一条消息
+    """
+
+    def __init__(self, max_connections=1000, idle_timeout=60, framed=False, verbose=False):
+        self.max_connections = max_connections
+        self.idle_timeout = idle_timeout
+        self.framed = framed
+        self.verbose = verbose
+        self.active = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    def _send(self, writer, payload):
+        if self.framed:
+            framing.write_frame(writer, payload)
+        else:
+            writer.write(payload)
+
+    async def _recv(self, reader):
+        if self.framed:
+            try:
+                return await framing.read_frame(reader)
+            except asyncio.IncompleteReadError:
+                return b''
+        return await reader.read(1024)
+
+    async def handle(self, reader, writer):
+        addr = writer.get_extra_info('peername')
+        if self.active >= self.max_connections:
+            self.rejected += 1
+            self._send(writer, b'Busy!')
+            writer.close()
+            return
+        self.active += 1
+        if self.verbose:
+            print('Accept new connection from %s:%s...' % addr[:2])
+        loop = asyncio.get_running_loop()
+        state = {'last': loop.time(), 'timer': None}
+
+        # 空闲超时：每个连接只挂一个定时器，到期时若期间有消息则顺延，否则关闭连接（读端随即收到EOF）。
+        # 比每条消息一个wait_for任务便宜得多。
+        def check_idle():
+            remaining = state['last'] + self.idle_timeout - loop.time()
+            if remaining > 0:
+                state['timer'] = loop.call_later(remaining, check_idle)
+            else:
+                self.timed_out += 1
+                writer.close()
+
+        if self.idle_timeout:
+            state['timer'] = loop.call_later(self.idle_timeout, check_idle)
+        try:
+            self._send(writer, b'Welcome!')
+            while True:
+                data = await self._recv(reader)
+                state['last'] = loop.time()
+                if not data or data == b'exit':
+                    break
+                self._send(writer, b'Hello, %s!' % data)
+                # 对端不读时在这里等待，避免写缓冲无限增长
+                await writer.drain()
+        except (ConnectionError, framing.FrameTooLarge):
+            pass
+        finally:
+            if state['timer'] is not None:
+                state['timer'].cancel()
+            self.active -= 1
+            writer.close()
+            if self.verbose:
+                print('Connection from %s:%s closed.' % addr[:2])
+
+    async def start(self, host='127.0.0.1', port=9999, backlog=100):
+        return await asyncio.start_server(
+            self.handle, host, port, backlog=backlog, reuse_address=True
+        )
+
+
+async def serve_async(host='127.0.0.1', port=9999, backlog=100, **kw):
+    server = await EchoServer(**kw).start(host, port, backlog)
+    print('Waiting for connection on %s:%s...' % server.sockets[0].getsockname()[:2])
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='welcome/echo/exit TCP server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9999)
+    parser.add_argument('--mode', choices=('async', 'thread'), default='async')
+    parser.add_argument('--backlog', type=int, default=100)
+    parser.add_argument('--max-connections', type=int, default=1000)
+    parser.add_argument('--idle-timeout', type=float, default=60)
+    parser.add_argument('--framing', choices=('raw', 'length'), default='raw')
+    parser.add_argument('--delay', type=float, default=1, help='thread mode: sleep per message')
+    parser.add_argument('--quiet', action='store_true')
+    args = parser.parse_args()
+    if args.mode == 'thread':
+        serve_threaded(args.host, args.port, args.backlog, args.delay)
+    else:
+        asyncio.run(
+            serve_async(
+                args.host,
+                args.port,
+                args.backlog,
+                max_connections=args.max_connections,
+                idle_timeout=args.idle_timeout or None,
+                framed=args.framing == 'length',
+                verbose=not args.quiet,
+            )
+        )
+
+
+if __name__ == '__main__':
+    main()